@@ -42,7 +42,12 @@ review_news() {
     local port=5001
     start_nbserver
     if [ -f "$HOME/IS_MOBILE" ] && command -v am >/dev/null 2>&1; then
-        ( sleep 2 && am start -a android.intent.action.VIEW -d "http://localhost:$port" org.mozilla.firefox ) &
+        # Wait until the server accepts connections (any /api/health answer, ready or not)
+        ( for _ in $(seq 50); do
+              curl -s -o /dev/null "http://localhost:$port/api/health" && break
+              sleep 0.2
+          done
+          am start -a android.intent.action.VIEW -d "http://localhost:$port" org.mozilla.firefox ) &
     fi
 }
 alias nr='review_news'
@@ -722,13 +727,14 @@ backup_newsboat_cache() {
     && echo "Backup complete: $BACKUP"
 }
 
-backup_newsboat_cache() {
+# Full single-file archive, for copying off the device
+backup_newsboat_cache_xz() {
     DIR=$(dirname "$NEWSBOAT_DB_FILE")
     ARCHIVE="$DIR/newsboat_db.tar"
     BACKUP="$DIR/newsboat_db.tar.xz"
 
     echo "Vacuuming..."
-    sqlite3 "$NEWSBOAT_DB_FILE" "VACUUM;"
+    sqlite3 "$NEWSBOAT_DB_FILE" "VACUUM; PRAGMA wal_checkpoint(TRUNCATE);"
     echo "Archiving files..." \
     && tar -chf "$ARCHIVE" \
         "$NEWSBOAT_DB_FILE" \
@@ -743,7 +749,18 @@ backup_newsboat_cache() {
     #mbup "$BACKUP"
 }
 
-alias nbcb='backup_newsboat_cache && cbup $HOME/newsboat/newsboat_db.tar.xz'
+# Incremental online snapshot: only pages changed since the last snapshot are stored, no VACUUM needed
+backup_newsboat_cache() {
+    python3 "$HOME/personal_scripts/nbserver/backup_cache.py" --store "${NEWSBOAT_SNAPSHOT_DIR:-$NEWSBOAT_DB_BUP_DIR/snapshots}" snapshot \
+        --db "$NEWSBOAT_DB_FILE" \
+        --include "$NEWSBOAT_URLS_FILE" \
+        --include "$NEWSBOAT_CONFIG_FILEPATH" \
+        --include "$HOME/my_bash.sh" \
+    && sync
+}
+alias nbsnaps='python3 "$HOME/personal_scripts/nbserver/backup_cache.py" --store "${NEWSBOAT_SNAPSHOT_DIR:-$NEWSBOAT_DB_BUP_DIR/snapshots}"'
+
+alias nbcb='backup_newsboat_cache_xz && cbup $HOME/newsboat/newsboat_db.tar.xz'
 
 # the db file is called the "cache" file for some reason in docs and man so
 #alias backup_newsboat_cache="cp --backup=t $NEWSBOAT_DB_FILEPATH $NEWSBOAT_DB_BACKUPS_DIR && sync"
@@ -827,11 +844,18 @@ nbserver_db_prepare() {
     curl -s -X GET http://localhost:5001/api/maintenance/prepare | jq -r '.message'
 }
 
+# Move the content of long-deleted items into the archive db; newsboat reuses the freed pages.
+# No VACUUM here: it rewrites every page, which would make the next snapshot a full copy
+nbserver_db_archive() {
+    curl -s -X POST "http://localhost:5001/api/maintenance/archive?days=${1:-30}" | jq -r '.message'
+}
+
 nbr() {
     backup_newsboat_cache
     echo "Scanning..."
     newsboat -c "$NEWSBOAT_DB_FILE" -C "$NEWSBOAT_CONFIG_FILEPATH" -u "$NEWSBOAT_URLS_FILE" -x reload print-unread
     nbserver_db_prepare
+    nbserver_db_archive
     rebait --qualify
     termux-vibrate
     termux-notification \
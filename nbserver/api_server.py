@@ -1,20 +1,72 @@
 import sqlite3
+import hashlib
+import html
+import json
+import re
+import functools
 from urllib.parse import parse_qs, urlparse
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, Response, g, has_request_context, jsonify, request, render_template, stream_with_context
 from flask_cors import CORS
 from datetime import datetime
 import os
+import time
+import zlib
 import argparse
+import atexit
+import gzip
+import signal
+import queue
 import threading
+import collections
+from contextlib import contextmanager
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import concurrent.futures
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 # Parse command line arguments
 parser = argparse.ArgumentParser(description='Newsboat API Server')
 parser.add_argument('--db', default='newsboat_cache.db', help='Path to the newsboat cache database')
-args = parser.parse_args()
+parser.add_argument('--server', default='waitress', choices=['waitress', 'dev'], help='waitress for the multi-threaded production server, dev for the Flask debug server')
+parser.add_argument('--host', default='0.0.0.0', help='Address to listen on')
+parser.add_argument('--port', type=int, default=5001, help='Port to listen on')
+parser.add_argument('--threads', type=int, default=8, help='Request handling threads (waitress)')
+parser.add_argument('--connection-limit', type=int, default=100, help='Maximum simultaneous client connections (waitress)')
+parser.add_argument('--keep-alive', type=int, default=120, help='Seconds an idle keep-alive connection stays open (waitress)')
+parser.add_argument('--shutdown-timeout', type=float, default=10, help='Seconds to let in-flight requests finish on shutdown (waitress)')
+parser.add_argument('--compress-min-size', type=int, default=1024, help='Smallest response body in bytes to gzip/brotli compress (0 disables compression)')
+parser.add_argument('--journal-mode', default='wal', choices=['delete', 'truncate', 'persist', 'wal'], help='SQLite journal mode; WAL lets reads proceed while newsboat writes')
+parser.add_argument('--synchronous', default='normal', choices=['off', 'normal', 'full', 'extra'], help='SQLite synchronous setting')
+parser.add_argument('--cache-size', type=int, default=-16000, help='SQLite page cache per connection (pages, or KiB if negative)')
+parser.add_argument('--mmap-size', type=int, default=64 * 1024 * 1024, help='Bytes of the database to memory map per connection (0 disables)')
+parser.add_argument('--busy-timeout', type=int, default=5000, help='Milliseconds to wait on a locked database before failing')
+parser.add_argument('--pool-size', type=int, default=4, help='Maximum number of pooled database connections')
+parser.add_argument('--dearrow-url', default='https://sponsor.ajay.app', help='Base URL of the DeArrow API')
+parser.add_argument('--dearrow-ttl', type=int, default=24 * 60 * 60, help='Seconds a cached DeArrow branding stays fresh')
+parser.add_argument('--dearrow-concurrency', type=int, default=10, help='Maximum concurrent DeArrow requests')
+parser.add_argument('--dearrow-rate', type=float, default=20, help='Maximum DeArrow requests per second to one host (0 disables)')
+parser.add_argument('--dearrow-deadline', type=float, default=60, help='Seconds a DeArrow batch may take before returning partial results')
+parser.add_argument('--dearrow-prefetch-concurrency', type=int, default=4, help='Concurrent requests of the background DeArrow prefetch worker (0 disables it)')
+parser.add_argument('--archive-db', default=None, help='Database that archived deleted items are moved to (default: next to --db, with .archive.db suffix)')
+parser.add_argument('--archive-after-days', type=int, default=30, help='Default age in days (by publish date) of deleted items /api/maintenance/archive moves to the archive')
+parser.add_argument('--item-cache-size', type=int, default=1024, help='Items kept in memory for the single item endpoints (0 disables)')
+parser.add_argument('--max-event-streams', type=int, default=4, help='Maximum concurrent /api/events streams; each holds one server thread')
+parser.add_argument('--event-poll-interval', type=float, default=2, help='Seconds between change log checks of an /api/events stream')
+parser.add_argument('--metrics', action='store_true', help='Time requests, SQL statements and DeArrow calls and serve the results at /api/metrics')
+parser.add_argument('--slow-query-ms', type=float, default=0, help='Log SQL statements that take longer than this many milliseconds, row fetching included (0 disables)')
+parser.add_argument('--dearrow-negative-ttl', type=int, default=6 * 60 * 60, help='Seconds a cached DeArrow miss (404 or no titles) stays fresh')
+# Defaults until create_app() parses the real command line, so importing the module has no side effects
+args = parser.parse_args([])
 
 app = Flask(__name__)
 CORS(app, resources={
@@ -25,25 +77,303 @@ CORS(app, resources={
     }
 })
 
-# Path to your SQLite database
-DB_PATH = args.db
+class ConnectionPool:
+    """A bounded pool of SQLite connections shared between request threads.
 
-# Thread-local storage for database connections
-thread_local = threading.local()
+    Connections are created lazily up to max_size; acquire() blocks while they are all in use.
+    """
 
-def get_db():
-    """Get a database connection for the current thread."""
-    if not hasattr(thread_local, 'connection'):
-        if not os.path.exists(DB_PATH):
-            print(f"Error: Database file not found at {DB_PATH}")
-            exit(1)
+    def __init__(self, db_path, max_size, timeout=30):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        factory = InstrumentedConnection if args.metrics or args.slow_query_ms > 0 else sqlite3.Connection
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=factory)
+        configure_connection(conn)
+        return conn
+
+    def acquire(self):
         try:
-            thread_local.connection = sqlite3.connect(DB_PATH)
-            thread_local.connection.row_factory = sqlite3.Row
-        except sqlite3.Error as e:
-            print(f"Error: Failed to connect to database: {str(e)}")
-            exit(1)
-    return thread_local.connection
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._all) < self.max_size:
+                conn = self._connect()
+                self._all.append(conn)
+                return conn
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError(f"No database connection available after {self.timeout}s")
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+
+def open_pool():
+    """Create the connection pool, switching the database to the configured journal mode."""
+    if not os.path.exists(args.db):
+        print(f"Error: Database file not found at {args.db}")
+        exit(1)
+    try:
+        pool = ConnectionPool(args.db, args.pool_size)
+        with pool.connection() as conn:
+            mode = conn.execute(f"PRAGMA journal_mode = {args.journal_mode}").fetchone()[0]
+            print(f"Database journal mode: {mode}")
+    except sqlite3.Error as e:
+        print(f"Error: Failed to connect to database: {str(e)}")
+        exit(1)
+    atexit.register(pool.close)
+    return pool
+
+# Opened by create_app()
+db_pool = None
+
+class Metrics:
+    """Counters and histograms kept in memory and rendered in the Prometheus text format.
+
+    Only filled when the server runs with --metrics.
+    """
+
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._descriptions = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def describe(self, name, kind, help_text):
+        self._descriptions[name] = (kind, help_text)
+
+    def inc(self, name, labels=None, amount=1):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(self.LATENCY_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(self.LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @staticmethod
+    def _format_labels(labels):
+        if not labels:
+            return ''
+        escaped = (
+            f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+            for key, value in labels
+        )
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(buckets), total, count) for key, (buckets, total, count) in self._histograms.items()}
+
+        lines = []
+        for name, (kind, help_text) in self._descriptions.items():
+            source = counters if kind == 'counter' else histograms
+            series = sorted((labels, value) for (series_name, labels), value in source.items() if series_name == name)
+            if not series:
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in series:
+                if kind == 'counter':
+                    lines.append(f'{name}{self._format_labels(labels)} {value}')
+                    continue
+                buckets, total, count = value
+                for bound, bucket_count in zip(self.LATENCY_BUCKETS, buckets):
+                    lines.append(f'{name}_bucket{self._format_labels(labels + (("le", str(bound)),))} {bucket_count}')
+                lines.append(f'{name}_bucket{self._format_labels(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{name}_sum{self._format_labels(labels)} {total}')
+                lines.append(f'{name}_count{self._format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+metrics.describe('nbserver_http_request_duration_seconds', 'histogram', 'Time from receiving a request until its response body was sent')
+metrics.describe('nbserver_http_response_bytes_total', 'counter', 'Response body bytes sent, after compression')
+metrics.describe('nbserver_sql_queries_total', 'counter', 'SQL statements executed')
+metrics.describe('nbserver_sql_query_seconds_total', 'counter', 'Time spent executing SQL statements and fetching their rows')
+metrics.describe('nbserver_sql_rows_total', 'counter', 'Rows fetched by queries or changed by writes')
+metrics.describe('nbserver_sql_slow_queries_total', 'counter', 'SQL statements slower than --slow-query-ms')
+metrics.describe('nbserver_dearrow_upstream_duration_seconds', 'histogram', 'DeArrow branding request latency by outcome')
+metrics.describe('nbserver_dearrow_cache_lookups_total', 'counter', 'DeArrow batch lookups answered from or missing in the branding cache')
+metrics.describe('nbserver_item_cache_lookups_total', 'counter', 'Single item lookups answered from or missing in the item cache')
+
+@functools.lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Collapse whitespace and placeholder lists so statements group by shape rather than parameter count."""
+    sql = re.sub(r'\s+', ' ', sql).strip()
+    return re.sub(r'\?(?:\s*,\s*\?)+', '?, ...', sql)
+
+def record_query(sql, seconds, rows):
+    query = normalize_sql(sql)
+    labels = {'query': query}
+    slow = args.slow_query_ms > 0 and seconds * 1000 >= args.slow_query_ms
+    if args.metrics:
+        metrics.inc('nbserver_sql_queries_total', labels)
+        metrics.inc('nbserver_sql_query_seconds_total', labels, seconds)
+        metrics.inc('nbserver_sql_rows_total', labels, rows)
+        if slow:
+            metrics.inc('nbserver_sql_slow_queries_total', labels)
+    if slow:
+        source = f"{request.method} {request.path}" if has_request_context() else threading.current_thread().name
+        print(f"Slow query ({seconds * 1000:.1f} ms, {rows} rows) in {source}: {query}")
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement from execute() until its rows have been consumed.
+
+    The statement is reported to record_query() once it is exhausted, re-executed, closed or collected.
+    """
+
+    _statement = None
+
+    def _account(self, started, rows=0):
+        if self._statement is not None:
+            self._statement[1] += time.perf_counter() - started
+            self._statement[2] += rows
+
+    def _finish(self, rows=None):
+        statement, self._statement = self._statement, None
+        if statement is not None:
+            record_query(statement[0], statement[1], statement[2] if rows is None else rows)
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self._statement = [sql, 0.0, 0]
+        started = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._account(started)
+            if self.description is None:
+                # Statements without a result set are done once executed
+                self._finish(max(self.rowcount, 0))
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        self._statement = [sql, 0.0, 0]
+        started = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        finally:
+            self._account(started)
+            self._finish(max(self.rowcount, 0))
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._account(started)
+            self._finish()
+            raise
+        self._account(started, 1)
+        return row
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._account(started, 0 if row is None else 1)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._account(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._account(started, len(rows))
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection handing out InstrumentedCursors, used with --metrics or --slow-query-ms."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection.execute() does not go through cursor(), so route the shortcuts explicitly
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def get_db():
+    """Get the pooled database connection for the current app context, returned to the pool on teardown."""
+    if 'db' not in g:
+        g.db = db_pool.acquire()
+        g.db_changes = g.db.total_changes
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exception):
+    conn = g.pop('db', None)
+    if conn is not None:
+        if conn.total_changes != g.pop('db_changes', conn.total_changes):
+            # Something was written; let event streams look at the change log now rather than at their next poll
+            event_broadcaster.wake()
+        db_pool.release(conn)
+
+def configure_connection(conn):
+    """Set up row access and the SQL functions nbserver's queries rely on."""
+    conn.row_factory = sqlite3.Row
+    conn.create_function('yt_id', 1, extract_youtube_video_id, deterministic=True)
+    conn.create_function('url_origin', 1, determine_origin, deterministic=True)
+    conn.create_function('html_text', 1, html_to_text, deterministic=True)
+    conn.create_function('add_flag', 2, sql_add_flag, deterministic=True)
+    conn.create_function('remove_flag', 2, sql_remove_flag, deterministic=True)
+    conn.execute(f"PRAGMA synchronous = {args.synchronous}")
+    conn.execute(f"PRAGMA cache_size = {int(args.cache_size)}")
+    conn.execute(f"PRAGMA mmap_size = {int(args.mmap_size)}")
+    conn.execute(f"PRAGMA busy_timeout = {int(args.busy_timeout)}")
 
 def column_exists(conn, table_name, column_name):
     cursor = conn.cursor()
@@ -51,6 +381,10 @@ def column_exists(conn, table_name, column_name):
     columns = [col[1] for col in cursor.fetchall()]
     return column_name in columns
 
+def index_columns(conn, index_name):
+    """Columns of an index in order, empty if it does not exist."""
+    return [row[2] for row in conn.execute(f"PRAGMA index_info({index_name})")]
+
 def extract_youtube_video_id(url):
     parsed = urlparse(url)
     
@@ -66,7 +400,7 @@ def extract_youtube_video_id(url):
             if shorts_index + 1 < len(parts) and parts[shorts_index + 1]:
                 return parts[shorts_index + 1]
         # Otherwise, get last part of path if it's embed or v
-        if parts[-2] in ['embed', 'v']:
+        if len(parts) >= 2 and parts[-2] in ['embed', 'v']:
             return parts[-1]
     
     if parsed.hostname == 'youtu.be':
@@ -75,36 +409,79 @@ def extract_youtube_video_id(url):
     return None
 
 def populate_youtube_ids():
-    """Populate youtube_id for all non-deleted items. Returns number of changed rows."""
+    """Populate youtube_id and origin for non-deleted items whose url has not been processed yet. Returns number of changed youtube_ids.
+
+    youtube_id_url records the url each youtube_id was extracted from, so only new rows
+    and rows whose url changed since the last pass are looked at. Extraction runs inside
+    SQLite through the yt_id() and url_origin() functions registered in configure_connection().
+    """
     conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT id, url, youtube_id FROM rss_item 
-        WHERE deleted = 0
-    """)
-    
-    changed_count = 0
+    pending_clause = "deleted = 0 AND (youtube_id_url IS NULL OR youtube_id_url != url OR origin IS NULL)"
     
-    for row in cursor.fetchall():
-        item_id = row['id']
-        url = row['url']
-        current_youtube_id = row['youtube_id']
-        new_youtube_id = extract_youtube_video_id(url)
+    with conn:
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM rss_item
+            WHERE {pending_clause}
+            AND youtube_id IS NOT yt_id(url)
+        """)
+        changed_count = cursor.fetchone()[0]
         
-        cursor.execute("""
+        cursor.execute(f"""
             UPDATE rss_item 
-            SET youtube_id = ? 
-            WHERE id = ?
-        """, (new_youtube_id, item_id))
-        changed_count += 1
+            SET youtube_id = yt_id(url), origin = url_origin(url), youtube_id_url = url
+            WHERE {pending_clause}
+        """)
+        checked_count = cursor.rowcount
     
-    conn.commit()
-    print(f"Populated YouTube IDs: {changed_count} changed")
+    print(f"Populated YouTube IDs: {checked_count} checked, {changed_count} changed")
     return changed_count
 
+def populate_channel_keys():
+    """Bring channel_key in line with the feed titles. Returns number of updated rows.
+
+    Triggers keep the key current as newsboat inserts items and renames feeds. The migration
+    that adds them runs this too, since channel listings order on the key straight off idx_rss_item_review.
+    """
+    conn = get_db()
+    with conn:
+        cursor = conn.execute("""
+            UPDATE rss_item
+            SET channel_key = (SELECT UPPER(title) FROM rss_feed WHERE rssurl = rss_item.feedurl)
+            WHERE deleted = 0
+            AND channel_key IS NOT (SELECT UPPER(title) FROM rss_feed WHERE rssurl = rss_item.feedurl)
+        """)
+    if cursor.rowcount:
+        print(f"Populated channel keys: {cursor.rowcount} changed")
+    return cursor.rowcount
+
+# deleted is always 0 in it, but SQLite only treats a partial index as covering when its WHERE columns are indexed too
+LIVE_FEEDURL_INDEX_COLUMNS = ('feedurl', 'id', 'unread', 'pubDate', 'is_clickbait', 'flags', 'youtube_id', 'deleted')
+
+# Bump whenever initialize_schema() or CHANGE_TRACKED_COLUMNS changes, so existing databases are migrated again
+SCHEMA_VERSION = 5
+
+def get_schema_version():
+    """The schema version recorded by the last migration, 0 if nbserver never migrated this database."""
+    try:
+        return int(get_meta('schema_version', 0))
+    except sqlite3.OperationalError:
+        # nbserver_meta is created by the first migration
+        return 0
+
 def initialize_schema():
+    """Add nbserver's columns, indexes, triggers and tables unless the database is already at SCHEMA_VERSION.
+
+    Returns True if migrations ran. Filling the new columns is left to run_startup_backfill(),
+    except channel_key, which listings depend on for their order and cursors.
+    """
+    global search_available
     conn = get_db()
+    if get_schema_version() == SCHEMA_VERSION:
+        search_available = search_index_exists()
+        return False
+
     cursor = conn.cursor()
 
     if not column_exists(conn, 'rss_item', 'is_clickbait'):
@@ -120,136 +497,1212 @@ def initialize_schema():
         print("Added column: rss_item.youtube_id")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_rss_item_youtube_id ON rss_item(youtube_id)")
         print("Created index: idx_rss_item_youtube_id")
-        
-    conn.commit()
-    populate_youtube_ids()
+
+    if not column_exists(conn, 'rss_item', 'youtube_id_url'):
+        cursor.execute("ALTER TABLE rss_item ADD COLUMN youtube_id_url TEXT DEFAULT NULL")
+        print("Added column: rss_item.youtube_id_url")
+
+    # Lets the youtube_id updates seek on (youtube_id, deleted) instead of scanning idx_deleted
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rss_item_youtube_id_deleted ON rss_item(youtube_id, deleted)")
+
+    if not column_exists(conn, 'rss_item', 'origin'):
+        cursor.execute("ALTER TABLE rss_item ADD COLUMN origin TEXT DEFAULT NULL")
+        print("Added column: rss_item.origin")
+
+    if not column_exists(conn, 'rss_item', 'channel_key'):
+        cursor.execute("ALTER TABLE rss_item ADD COLUMN channel_key TEXT DEFAULT NULL")
+        print("Added column: rss_item.channel_key")
+
+    # Review listings read live items in (channel_key, id) order straight off this index
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rss_item_review ON rss_item(channel_key, id) WHERE deleted = 0")
+    cursor.executescript("""
+        CREATE TRIGGER IF NOT EXISTS nbserver_item_channel_key AFTER INSERT ON rss_item
+        BEGIN
+            UPDATE rss_item
+            SET channel_key = (SELECT UPPER(title) FROM rss_feed WHERE rssurl = NEW.feedurl)
+            WHERE id = NEW.id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS nbserver_feed_channel_key AFTER UPDATE OF title ON rss_feed
+        WHEN OLD.title IS NOT NEW.title
+        BEGIN
+            UPDATE rss_item SET channel_key = UPPER(NEW.title) WHERE feedurl = NEW.rssurl;
+        END;
+    """)
+    populate_channel_keys()
+
+    initialize_change_log(cursor)
+
+    cursor.execute("CREATE TABLE IF NOT EXISTS nbserver_meta (key TEXT PRIMARY KEY, value)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rss_item_live_pubdate ON rss_item(pubDate, id) WHERE deleted = 0")
+    # Serves channel filters in id order and covers the /api/channels aggregates.
+    # Databases migrated before the aggregates had it without the trailing columns.
+    if index_columns(conn, 'idx_rss_item_live_feedurl') != list(LIVE_FEEDURL_INDEX_COLUMNS):
+        cursor.execute("DROP INDEX IF EXISTS idx_rss_item_live_feedurl")
+        cursor.execute(f"CREATE INDEX idx_rss_item_live_feedurl ON rss_item({', '.join(LIVE_FEEDURL_INDEX_COLUMNS)}) WHERE deleted = 0")
+    # Deleted items whose content has not been archived yet; rows leave it as they are archived
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rss_item_archivable ON rss_item(pubDate) WHERE deleted = 1 AND content != ''")
+    initialize_search_index(cursor)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dearrow_branding (
+            youtube_id TEXT PRIMARY KEY,
+            payload TEXT,
+            has_titles INTEGER NOT NULL DEFAULT 0,
+            fetched_at INTEGER NOT NULL
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dearrow_queue (
+            youtube_id TEXT PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at INTEGER NOT NULL,
+            last_error TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dearrow_queue_next_attempt_at ON dearrow_queue(next_attempt_at)")
+
+    initialize_verdict_store(cursor)
+
+    set_meta('schema_version', SCHEMA_VERSION)
     conn.commit()
+    print(f"Migrated schema to version {SCHEMA_VERSION}")
+    return True
+
+# Columns whose changes are visible in item listings and single item responses
+CHANGE_TRACKED_COLUMNS = ('title', 'author', 'url', 'content', 'unread', 'flags', 'pubDate', 'feedurl', 'is_clickbait', 'rebait_title', 'youtube_id')
+
+# How long change log entries are kept; clients further behind have to reload everything
+CHANGE_LOG_RETENTION_DAYS = 7
+
+def initialize_change_log(cursor):
+    """Create the change log and the triggers that fill it.
+
+    Triggers record every insert, listed-column update and deletion of rss_item rows,
+    including those made by newsboat itself, so the latest seq doubles as a change token.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS nbserver_item_change (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            changed_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_nbserver_item_change_changed_at ON nbserver_item_change(changed_at)")
+
+    columns_changed = ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in CHANGE_TRACKED_COLUMNS)
+    # Recreated on every migration so the triggers follow CHANGE_TRACKED_COLUMNS
+    cursor.executescript(f"""
+        DROP TRIGGER IF EXISTS nbserver_item_inserted;
+        DROP TRIGGER IF EXISTS nbserver_item_updated;
+        DROP TRIGGER IF EXISTS nbserver_item_deleted_flag;
+        DROP TRIGGER IF EXISTS nbserver_item_removed;
+        DROP TRIGGER IF EXISTS nbserver_feed_updated;
+
+        CREATE TRIGGER IF NOT EXISTS nbserver_item_inserted AFTER INSERT ON rss_item
+        WHEN NEW.deleted = 0
+        BEGIN
+            INSERT INTO nbserver_item_change (item_id, kind) VALUES (NEW.id, 'insert');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS nbserver_item_updated AFTER UPDATE OF {', '.join(CHANGE_TRACKED_COLUMNS)} ON rss_item
+        WHEN NEW.deleted = 0 AND OLD.deleted = 0 AND ({columns_changed})
+        BEGIN
+            INSERT INTO nbserver_item_change (item_id, kind) VALUES (NEW.id, 'update');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS nbserver_item_deleted_flag AFTER UPDATE OF deleted ON rss_item
+        WHEN OLD.deleted IS NOT NEW.deleted
+        BEGIN
+            INSERT INTO nbserver_item_change (item_id, kind)
+            VALUES (NEW.id, CASE WHEN NEW.deleted = 0 THEN 'insert' ELSE 'delete' END);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS nbserver_item_removed AFTER DELETE ON rss_item
+        WHEN OLD.deleted = 0
+        BEGIN
+            INSERT INTO nbserver_item_change (item_id, kind) VALUES (OLD.id, 'delete');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS nbserver_feed_updated AFTER UPDATE OF title, url ON rss_feed
+        WHEN OLD.title IS NOT NEW.title OR OLD.url IS NOT NEW.url
+        BEGIN
+            INSERT INTO nbserver_item_change (item_id, kind)
+            SELECT id, 'update' FROM rss_item WHERE feedurl = NEW.rssurl AND deleted = 0;
+        END;
+    """)
+
+def initialize_verdict_store(cursor):
+    """Create clickbait_verdict, the nbserver_item_verdict view and the triggers that log verdict changes.
+
+    Verdicts are keyed by youtube_id rather than stored on rss_item rows, so they apply to items newsboat
+    inserts later for an already judged video. Existing is_clickbait/rebait_title values are copied in first.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS clickbait_verdict (
+            youtube_id TEXT PRIMARY KEY,
+            verdict INTEGER,
+            rebait_title TEXT,
+            model TEXT,
+            model_version TEXT,
+            judged_at INTEGER NOT NULL
+        )
+    """)
+    # Before the triggers exist, so copying does not flood the change log
+    cursor.executescript("""
+        DROP TRIGGER IF EXISTS nbserver_verdict_inserted;
+        DROP TRIGGER IF EXISTS nbserver_verdict_updated;
+        DROP TRIGGER IF EXISTS nbserver_verdict_deleted;
+    """)
+    cursor.execute("""
+        INSERT OR IGNORE INTO clickbait_verdict (youtube_id, verdict, rebait_title, judged_at)
+        SELECT youtube_id, MAX(is_clickbait), MAX(rebait_title), CAST(strftime('%s', 'now') AS INTEGER)
+        FROM rss_item
+        WHERE youtube_id IS NOT NULL
+        AND (is_clickbait IS NOT NULL OR rebait_title IS NOT NULL)
+        GROUP BY youtube_id
+    """)
+    if cursor.rowcount:
+        print(f"Copied clickbait verdicts: {cursor.rowcount}")
+
+    # For reading verdicts straight from SQLite (rebait, the sqlite3 shell); listings use the same expressions
+    cursor.executescript(f"""
+        DROP VIEW IF EXISTS nbserver_item_verdict;
+        CREATE VIEW nbserver_item_verdict AS
+        SELECT
+            rss_item.id,
+            rss_item.youtube_id,
+            rss_item.deleted,
+            {ITEM_LIST_FIELDS['is_clickbait']} AS is_clickbait,
+            {ITEM_LIST_FIELDS['rebait_title']} AS rebait_title,
+            clickbait_verdict.model,
+            clickbait_verdict.model_version,
+            clickbait_verdict.judged_at
+        FROM rss_item
+        {VERDICT_JOIN};
+
+        CREATE TRIGGER nbserver_verdict_inserted AFTER INSERT ON clickbait_verdict
+        BEGIN
+            INSERT INTO nbserver_item_change (item_id, kind)
+            SELECT id, 'update' FROM rss_item WHERE youtube_id = NEW.youtube_id AND deleted = 0;
+        END;
+
+        CREATE TRIGGER nbserver_verdict_updated AFTER UPDATE OF verdict, rebait_title ON clickbait_verdict
+        WHEN OLD.verdict IS NOT NEW.verdict OR OLD.rebait_title IS NOT NEW.rebait_title
+        BEGIN
+            INSERT INTO nbserver_item_change (item_id, kind)
+            SELECT id, 'update' FROM rss_item WHERE youtube_id = NEW.youtube_id AND deleted = 0;
+        END;
+
+        CREATE TRIGGER nbserver_verdict_deleted AFTER DELETE ON clickbait_verdict
+        BEGIN
+            INSERT INTO nbserver_item_change (item_id, kind)
+            SELECT id, 'update' FROM rss_item WHERE youtube_id = OLD.youtube_id AND deleted = 0;
+        END;
+    """)
 
-# Test database connection immediately
-get_db()
-initialize_schema()
+# AUTOINCREMENT's high-water mark: unlike MAX(seq) it never goes back down when the log is pruned,
+# so a token is never handed out twice for different data
+CHANGE_TOKEN_SQL = "COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'nbserver_item_change'), 0)"
+
+def get_change_token():
+    """The sequence number of the latest recorded item change, 0 if none was ever recorded."""
+    cursor = get_db().execute(f"SELECT {CHANGE_TOKEN_SQL}")
+    return cursor.fetchone()[0]
+
+def get_change_log_range(conn):
+    """Returns (floor, token): the log holds every change with floor < seq <= token.
+
+    A token below floor has had changes pruned after it, including when the log is empty.
+    """
+    oldest, token = conn.execute(f"SELECT (SELECT MIN(seq) FROM nbserver_item_change), {CHANGE_TOKEN_SQL}").fetchone()
+    return (token if oldest is None else oldest - 1), token
+
+def prune_change_log():
+    """Drop change log entries older than CHANGE_LOG_RETENTION_DAYS. Returns number of removed entries."""
+    conn = get_db()
+    with conn:
+        cursor = conn.execute("""
+            DELETE FROM nbserver_item_change
+            WHERE changed_at < CAST(strftime('%s', 'now') AS INTEGER) - ?
+        """, (CHANGE_LOG_RETENTION_DAYS * 24 * 60 * 60,))
+    return cursor.rowcount
+
+def get_changes_since(since):
+    """Summarize item changes after the given token.
+
+    Returns (inserted, updated, deleted) id lists reflecting each item's current state,
+    or None if the log no longer reaches back to since.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+
+    floor, _ = get_change_log_range(conn)
+    if since < floor:
+        return None
+
+    cursor.execute("""
+        SELECT
+            change.item_id,
+            MAX(change.kind = 'insert') AS was_inserted,
+            rss_item.deleted
+        FROM nbserver_item_change AS change
+        LEFT JOIN rss_item ON rss_item.id = change.item_id
+        WHERE change.seq > ?
+        GROUP BY change.item_id
+    """, (since,))
+
+    inserted, updated, deleted = [], [], []
+    for row in cursor:
+        if row['deleted'] is None or row['deleted'] != 0:
+            deleted.append(row['item_id'])
+        elif row['was_inserted']:
+            inserted.append(row['item_id'])
+        else:
+            updated.append(row['item_id'])
+    return inserted, updated, deleted
+
+def get_meta(key, default=None):
+    row = get_db().execute("SELECT value FROM nbserver_meta WHERE key = ?", (key,)).fetchone()
+    return row['value'] if row else default
+
+def set_meta(key, value):
+    get_db().execute("INSERT OR REPLACE INTO nbserver_meta (key, value) VALUES (?, ?)", (key, value))
+
+# Set by initialize_search_index(); False when SQLite was built without FTS5
+search_available = False
+
+def initialize_search_index(cursor):
+    """Create the FTS5 table over live item titles and text content, if FTS5 is available."""
+    global search_available
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS rss_item_fts
+            USING fts5(title, content, tokenize = 'unicode61 remove_diacritics 2')
+        """)
+        search_available = True
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search disabled: {str(e)}")
+        search_available = False
+
+def search_index_exists():
+    """Whether rss_item_fts exists and this SQLite build can query it."""
+    try:
+        get_db().execute("SELECT 1 FROM rss_item_fts LIMIT 0")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def refresh_search_index():
+    """Bring rss_item_fts up to date with the change log. Returns number of reindexed items.
+
+    Only live items are indexed. The change log seq reached last time is kept in nbserver_meta;
+    if the log has since been pruned past it, the index is rebuilt from scratch.
+    """
+    if not search_available:
+        return 0
+
+    conn = get_db()
+    cursor = conn.cursor()
+    with conn:
+        floor, token = get_change_log_range(conn)
+        indexed_seq = get_meta('fts_change_seq')
+
+        if indexed_seq is None or int(indexed_seq) < floor:
+            cursor.execute("DELETE FROM rss_item_fts")
+            cursor.execute("""
+                INSERT INTO rss_item_fts (rowid, title, content)
+                SELECT id, title, html_text(content) FROM rss_item WHERE deleted = 0
+            """)
+            reindexed = cursor.rowcount
+        else:
+            cursor.execute("""
+                SELECT DISTINCT item_id FROM nbserver_item_change WHERE seq > ? AND seq <= ?
+            """, (int(indexed_seq), token))
+            item_ids = [(row['item_id'],) for row in cursor.fetchall()]
+            cursor.executemany("DELETE FROM rss_item_fts WHERE rowid = ?", item_ids)
+            cursor.executemany("""
+                INSERT INTO rss_item_fts (rowid, title, content)
+                SELECT id, title, html_text(content) FROM rss_item WHERE id = ? AND deleted = 0
+            """, item_ids)
+            reindexed = len(item_ids)
+
+        set_meta('fts_change_seq', token)
+
+    if reindexed:
+        print(f"Refreshed search index: {reindexed} items")
+    return reindexed
 
 @app.route('/')
 def index():
     """Serve the frontend application."""
     return render_template('index.html')
 
-def get_non_deleted_items(only_pending_clickbait=False):
+# Selectable listing fields and the SQL expression each one is read from
+ITEM_LIST_FIELDS = {
+    'id': 'rss_item.id',
+    'channel_name': 'rss_feed.title',
+    'channel_url': 'rss_feed.url',
+    'title': 'rss_item.title',
+    # Verdicts recorded in clickbait_verdict win over the values on the row itself
+    'rebait_title': 'COALESCE(clickbait_verdict.rebait_title, rss_item.rebait_title)',
+    'url': 'rss_item.url',
+    'deleted': 'rss_item.deleted',
+    'unread': 'rss_item.unread',
+    'pubDate': 'rss_item.pubDate',
+    'content': 'rss_item.content',
+    'author': 'rss_item.author',
+    'feedurl': 'rss_item.feedurl',
+    'flags': 'rss_item.flags',
+    'is_clickbait': 'COALESCE(clickbait_verdict.verdict, rss_item.is_clickbait)',
+    'youtube_id': 'rss_item.youtube_id',
+    # origin is stored at prepare time; rows newsboat inserted since then fall back to url_origin()
+    'origin': 'COALESCE(rss_item.origin, url_origin(rss_item.url))',
+}
+
+# SQLite leaves the join out of queries that use no verdict columns
+VERDICT_JOIN = 'LEFT JOIN clickbait_verdict ON clickbait_verdict.youtube_id = rss_item.youtube_id'
+
+# Always returned, since the keyset cursor is built from them
+REQUIRED_ITEM_FIELDS = ('id', 'channel_name')
+
+# content is by far the largest column, so listings leave it out unless asked for
+DEFAULT_ITEM_FIELDS = tuple(field for field in ITEM_LIST_FIELDS if field not in ('content', 'author'))
+
+def parse_fields(fields_param):
+    """Parse a comma separated fields= parameter. Returns a tuple of field names or raises ValueError."""
+    if fields_param is None:
+        return DEFAULT_ITEM_FIELDS
+
+    fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in ITEM_LIST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+    return tuple(dict.fromkeys([*REQUIRED_ITEM_FIELDS, *fields]))
+
+# Listing sort orders: name -> (column, cursor placeholder, partial index that yields rows in that order)
+LISTING_SORTS = {
+    'channel': ('rss_item.channel_key', 'UPPER(?)', 'idx_rss_item_review'),
+    'pubDate': ('rss_item.pubDate', '?', 'idx_rss_item_live_pubdate'),
+    'title': ('rss_item.title', '?', None),
+}
+
+def parse_after_cursor(after, sort='channel'):
+    """Parse a keyset cursor of the form '<sort key>,<id>'. Returns (sort key, id) or raises ValueError."""
+    key, sep, item_id = after.rpartition(',')
+    if not sep:
+        raise ValueError("after must be of the form '<sort key>,<id>'")
+    if sort == 'pubDate':
+        key = int(key)
+    return key, int(item_id)
+
+def row_to_item(row, fields=DEFAULT_ITEM_FIELDS):
+    item = {}
+    for field in fields:
+        if field == 'pubDate':
+            item['pubDate'] = datetime.fromtimestamp(row['pubDate']).strftime('%Y-%m-%d %H:%M:%S')
+        elif field == 'youtube_id':
+            if row['youtube_id'] is not None:
+                item['youtube_id'] = row['youtube_id']
+        else:
+            item[field] = row[field]
+    return item
+
+def item_select_sql(fields, indexed_by=None, extra_columns=()):
+    """SELECT ... FROM clause producing the columns needed for fields, optionally pinned to an rss_item index."""
+    columns = [f'{ITEM_LIST_FIELDS[field]} AS {field}' for field in fields] + list(extra_columns)
+    return f"""
+        SELECT
+            {', '.join(columns)}
+        FROM
+            rss_item {f'INDEXED BY {indexed_by}' if indexed_by else ''}
+        INNER JOIN
+            rss_feed ON rss_item.feedurl = rss_feed.rssurl
+        {VERDICT_JOIN}
+    """
+
+def iter_non_deleted_items(only_pending_clickbait=False, after=None, limit=None, fields=DEFAULT_ITEM_FIELDS,
+                           filters=(), sort='channel', descending=False, with_cursor=False, rows=False):
+    """Yield non-deleted items straight off the cursor, ordered by (sort key, id).
+
+    after is an optional (sort key, id) keyset cursor; only items sorting strictly after it are returned.
+    filters is a sequence of (SQL condition, params) pairs from parse_listing_filters().
+    Only the columns needed for fields are read from SQLite. Channel and pubDate orders come
+    straight from a partial index, so no sort step is needed however large the cache is.
+    With with_cursor, (item, cursor) pairs are yielded, cursor resuming right after that item.
+    With rows, the sqlite3.Row objects are yielded as read: the fields in order, then sort_key.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    sort_column, cursor_placeholder, sort_index = LISTING_SORTS[sort]
+    direction = 'DESC' if descending else 'ASC'
+
+    conditions = ["rss_item.deleted = 0"]
+    params = []
+    if only_pending_clickbait:
+        conditions.append(PENDING_CLICKBAIT_CONDITION)
+    for condition, condition_params in filters:
+        conditions.append(condition)
+        params.extend(condition_params)
+    if after is not None:
+        after_key, after_id = after
+        conditions.append(f"({sort_column}, rss_item.id) {'<' if descending else '>'} ({cursor_placeholder}, ?)")
+        params.extend([after_key, after_id])
+
+    limit_clause = ""
+    if limit is not None:
+        limit_clause = "LIMIT ?"
+        params.append(limit)
+
+    # Without ANALYZE statistics the planner prefers newsboat's idx_deleted plus a sort.
+    # Searches and feed filters are better driven from the FTS table and idx_feedurl.
+    pinned_index = sort_index
+    if any(condition.startswith(('rss_item.feedurl', 'rss_item.id IN')) for condition, _ in filters):
+        pinned_index = None
+
     try:
-        conn = get_db()
-        cursor = conn.cursor()
+        cursor.execute(f"""
+            {item_select_sql(fields, indexed_by=pinned_index, extra_columns=[f'{sort_column} AS sort_key'])}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {sort_column} {direction}, rss_item.id {direction}
+            {limit_clause};
+        """, params)
+    except sqlite3.OperationalError as e:
+        # FTS5 reports a query it can't parse as a plain SQLITE_ERROR once the MATCH runs, unlike busy/locked errors
+        searching = any(condition == SEARCH_CONDITION for condition, _ in filters)
+        if searching and getattr(e, 'sqlite_errorname', None) == 'SQLITE_ERROR':
+            raise SearchQueryError(f"Invalid search query: {e}") from e
+        raise
+
+    if rows:
+        yield from cursor
+        return
+
+    for row in cursor:
+        item = row_to_item(row, fields)
+        if with_cursor:
+            yield item, f"{row['sort_key']},{row['id']}"
+        else:
+            yield item
+
+def get_non_deleted_items_by_ids(item_ids, fields=DEFAULT_ITEM_FIELDS):
+    """Fetch the listing representation of specific non-deleted items."""
+    cursor = get_db().cursor()
+    items = []
+    for chunk in chunked(item_ids):
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f"""
+            {item_select_sql(fields)}
+            WHERE rss_item.id IN ({placeholders})
+            AND deleted = 0
+        """, chunk)
+        items.extend(row_to_item(row, fields) for row in cursor)
+    return items
 
-        where_clause = "WHERE deleted = 0"
-        if only_pending_clickbait:
-            where_clause += " AND is_clickbait IS NULL"
+def listing_etag(change_token):
+    """ETag for a listing response: the change token plus a digest of the request variant."""
+    variant = f"{request.full_path}|{request.headers.get('Accept', '')}"
+    return f"{change_token}-{hashlib.sha1(variant.encode()).hexdigest()[:12]}"
+
+def make_conditional_listing(response, etag):
+    response.set_etag(etag)
+    # Let the browser keep the listing but revalidate it on every load
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept')
+    return response
+
+def not_modified(etag):
+    return make_conditional_listing(Response(status=304), etag)
+
+# Content codings compress_response() applies; each gets the uncompressed ETag plus '-<coding>'
+COMPRESSION_CODINGS = ('br', 'gzip')
+
+def matching_etag(etag):
+    """The variant of etag If-None-Match names, compressed or not, or None."""
+    for candidate in (etag, *(f'{etag}-{coding}' for coding in COMPRESSION_CODINGS)):
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
 
-        cursor.execute(f"""
-            SELECT
-                rss_item.id,
-                rss_feed.title AS channel_name,
-                rss_feed.url AS channel_url,
-                rss_item.title,
-                rss_item.rebait_title,
-                rss_item.url,
-                rss_item.deleted,
-                rss_item.unread,
-                rss_item.pubDate,
-                rss_item.content,
-                rss_item.author,
-                rss_item.feedurl,
-                rss_item.flags,
-                rss_item.is_clickbait,
-                rss_item.youtube_id
-            FROM
-                rss_item
-            INNER JOIN
-                rss_feed ON rss_item.feedurl = rss_feed.rssurl
-            {where_clause}
-            ORDER BY UPPER(channel_name) ASC;
-        """)
-        rows = cursor.fetchall()
+def parse_bool_arg(name, value):
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f'{name} must be true or false')
+
+def parse_time_arg(name, value):
+    """Parse epoch seconds or a YYYY-MM-DD date (local midnight) into epoch seconds."""
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return int(datetime.strptime(value, '%Y-%m-%d').timestamp())
+    except ValueError:
+        raise ValueError(f'{name} must be epoch seconds or YYYY-MM-DD')
+
+def fts_query(text):
+    """Turn free text into an FTS5 query matching every word, so user input can't hit MATCH syntax errors."""
+    # FTS5 ends a quoted string at a NUL byte
+    terms = [term.replace('"', '""') for term in text.replace('\0', ' ').split()]
+    return ' '.join(f'"{term}"' for term in terms)
+
+SEARCH_CONDITION = "rss_item.id IN (SELECT rowid FROM rss_item_fts WHERE rss_item_fts MATCH ?)"
+
+class SearchQueryError(ValueError):
+    """FTS5 rejected a q= search; the client's fault, unlike other SQLite errors."""
+
+# Items still to be judged: no verdict on the row and none recorded for its youtube_id
+PENDING_CLICKBAIT_CONDITION = """(rss_item.is_clickbait IS NULL AND NOT EXISTS (
+    SELECT 1 FROM clickbait_verdict
+    WHERE clickbait_verdict.youtube_id = rss_item.youtube_id AND clickbait_verdict.verdict IS NOT NULL
+))"""
+
+STARRED_CONDITION = "(instr(COALESCE(rss_item.flags, ''), 'S') > 0 OR instr(COALESCE(rss_item.flags, ''), 's') > 0)"
+
+def parse_listing_filters(query_args):
+    """Build (SQL condition, params) pairs from the listing filter parameters. Raises ValueError."""
+    filters = []
+
+    if 'channel' in query_args:
+        filters.append(("rss_item.channel_key = UPPER(?)", [query_args['channel']]))
+    if 'feedurl' in query_args:
+        filters.append(("rss_item.feedurl = ?", [query_args['feedurl']]))
+    if 'origin' in query_args:
+        filters.append((f"{ITEM_LIST_FIELDS['origin']} = ?", [query_args['origin']]))
+    if 'starred' in query_args:
+        starred = parse_bool_arg('starred', query_args['starred'])
+        filters.append((STARRED_CONDITION if starred else f"NOT {STARRED_CONDITION}", []))
+    if 'unread' in query_args:
+        filters.append(("rss_item.unread = ?", [1 if parse_bool_arg('unread', query_args['unread']) else 0]))
+    if 'is_clickbait' in query_args:
+        if query_args['is_clickbait'] == 'pending':
+            filters.append((PENDING_CLICKBAIT_CONDITION, []))
+        else:
+            filters.append((f"{ITEM_LIST_FIELDS['is_clickbait']} = ?", [1 if parse_bool_arg('is_clickbait', query_args['is_clickbait']) else 0]))
+    if 'youtube' in query_args:
+        youtube_only = parse_bool_arg('youtube', query_args['youtube'])
+        filters.append((f"rss_item.youtube_id IS {'NOT ' if youtube_only else ''}NULL", []))
+    if 'since' in query_args:
+        filters.append(("rss_item.pubDate >= ?", [parse_time_arg('since', query_args['since'])]))
+    if 'until' in query_args:
+        filters.append(("rss_item.pubDate < ?", [parse_time_arg('until', query_args['until'])]))
+    if query_args.get('q', '').strip():
+        if not search_available:
+            raise ValueError('Search is not available: this SQLite build has no FTS5')
+        filters.append((SEARCH_CONDITION, [fts_query(query_args['q'])]))
+
+    return filters
+
+def parse_listing_args():
+    """Validate the listing query parameters. Returns (listing, error_response).
+
+    listing holds after, limit, fields, filters, sort and descending, ready for iter_non_deleted_items().
+    """
+    try:
+        sort = request.args.get('sort', 'channel')
+        if sort not in LISTING_SORTS:
+            raise ValueError(f"sort must be one of: {', '.join(LISTING_SORTS)}")
+
+        order = request.args.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            raise ValueError('order must be asc or desc')
+
+        fields = parse_fields(request.args.get('fields'))
+        filters = parse_listing_filters(request.args)
+
+        after = request.args.get('after')
+        if after is not None:
+            try:
+                after = parse_after_cursor(after, sort)
+            except ValueError:
+                raise ValueError("after must be of the form '<sort key>,<id>'")
+
+        limit = request.args.get('limit')
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                limit = 0
+            if limit <= 0:
+                raise ValueError('limit must be a positive integer')
+    except ValueError as e:
+        return None, (jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400)
+
+    return {
+        'after': after,
+        'limit': limit,
+        'fields': fields,
+        'filters': filters,
+        'sort': sort,
+        'descending': order == 'desc'
+    }, None
+
+# Fields whose few distinct values repeat across a channel's items
+DICTIONARY_FIELDS = ('channel_name', 'channel_url', 'feedurl', 'origin')
+
+def build_columnar_listing(rows, fields):
+    """Column-oriented listing: one array per field instead of one object per item.
+
+    Columns in DICTIONARY_FIELDS hold indexes into dictionaries[field].
+    pubDate stays in epoch seconds for the client to format.
+    """
+    columns = dict(zip(fields, zip(*rows))) if rows else {field: () for field in fields}
+    dictionaries = {}
+    for field in DICTIONARY_FIELDS:
+        if field in columns:
+            index = {}
+            columns[field] = [index.setdefault(value, len(index)) for value in columns[field]]
+            dictionaries[field] = list(index)
+
+    return {
+        'fields': list(fields),
+        'count': len(rows),
+        'columns': columns,
+        'dictionaries': dictionaries
+    }
+
+# Listing encodings other than the default JSON array: ?format= name -> media types that select it through Accept
+LISTING_FORMATS = {
+    'ndjson': ('application/x-ndjson',),
+    'columns': ('application/vnd.nbserver.columns+json',),
+    'msgpack': ('application/vnd.nbserver.columns+msgpack', 'application/msgpack', 'application/x-msgpack'),
+}
+
+def listing_format():
+    """The listing encoding the client asked for with ?format= or Accept: json, ndjson, columns or msgpack."""
+    requested = request.args.get('format')
+    if requested is not None:
+        return requested
+
+    best = request.accept_mimetypes.best
+    for name, media_types in LISTING_FORMATS.items():
+        if best in media_types:
+            return name
+    return 'json'
+
+def stream_items_ndjson(only_pending_clickbait, listing):
+    """Stream items one JSON document per line, without materializing the listing.
+
+    The query starts before the response does, so errors like SearchQueryError still get a status code.
+    """
+    items = iter_non_deleted_items(only_pending_clickbait, **listing)
+    first = next(items, None)
+
+    def generate():
+        try:
+            if first is not None:
+                yield json.dumps(first) + '\n'
+            for item in items:
+                yield json.dumps(item) + '\n'
+        except Exception as e:
+            print(f"Error in stream_items_ndjson: {str(e)}")
+            yield json.dumps({'status': 'error', 'message': str(e)}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def respond_with_columns(only_pending_clickbait, listing, change_token, encoding):
+    rows = list(iter_non_deleted_items(only_pending_clickbait, rows=True, **listing))
+    response = {
+        'status': 'success',
+        'data': build_columnar_listing(rows, listing['fields']),
+        'change_token': change_token
+    }
+    if listing['limit'] is not None:
+        last = rows[-1] if len(rows) == listing['limit'] else None
+        response['next_after'] = f"{last['sort_key']},{last['id']}" if last is not None else None
+
+    if encoding == 'msgpack':
+        return Response(msgpack.packb(response), mimetype=LISTING_FORMATS['msgpack'][0])
+    return Response(json.dumps(response, separators=(',', ':')), mimetype=LISTING_FORMATS['columns'][0])
+
+def respond_with_items(only_pending_clickbait=False, filters=()):
+    listing, error_response = parse_listing_args()
+    if error_response:
+        response, status_code = error_response
+        return response, status_code
+    listing['filters'] = [*filters, *listing['filters']]
+
+    encoding = listing_format()
+    if encoding != 'json' and encoding not in LISTING_FORMATS:
+        return jsonify({
+            'status': 'error',
+            'message': f"format must be one of: json, {', '.join(LISTING_FORMATS)}"
+        }), 400
+    if encoding == 'msgpack' and msgpack is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'MessagePack is not available: install the msgpack package'
+        }), 406
+
+    change_token = get_change_token()
+    etag = listing_etag(change_token)
+    cached_etag = matching_etag(etag)
+    if cached_etag:
+        return not_modified(cached_etag)
+
+    try:
+        if encoding == 'ndjson':
+            return make_conditional_listing(stream_items_ndjson(only_pending_clickbait, listing), etag)
+
+        if encoding in ('columns', 'msgpack'):
+            return make_conditional_listing(respond_with_columns(only_pending_clickbait, listing, change_token, encoding), etag)
 
         items = []
-        for row in rows:
-            pub_date = datetime.fromtimestamp(row['pubDate']).strftime('%Y-%m-%d %H:%M:%S')
-            
-            item = {
-                'id': row['id'],
-                'channel_name': row['channel_name'],
-                'channel_url': row['channel_url'],
-                'title': row['title'],
-                'rebait_title': row['rebait_title'],
-                'url': row['url'],
-                'deleted': row['deleted'],
-                'unread': row['unread'],
-                'pubDate': pub_date,
-                'content': row['content'],
-                'feedurl': row['feedurl'],
-                'flags': row['flags'],
-                'is_clickbait': row['is_clickbait'],
-                **({'youtube_id': row['youtube_id']} if row['youtube_id'] is not None else {})
-            }
-            
+        next_after = None
+        for item, next_after in iter_non_deleted_items(only_pending_clickbait, with_cursor=True, **listing):
             items.append(item)
-        
-        return items
+        response = {
+            'status': 'success',
+            'data': items,
+            'change_token': change_token
+        }
+        if listing['limit'] is not None:
+            response['next_after'] = next_after if len(items) == listing['limit'] else None
+        return make_conditional_listing(jsonify(response), etag)
+    except SearchQueryError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     except Exception as e:
-        print(f"Error in get_non_deleted_items: {str(e)}")
-        return []
+        print(f"Error in respond_with_items: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
 
 @app.route('/api/items', methods=['GET', 'OPTIONS'])
 def get_items():
-        
-    try:
-        items = get_non_deleted_items()
-        items = process_items(items)
+    """List non-deleted items.
+
+    Supports ?after=<sort key,id>&limit=N keyset pagination, ?fields= projection, ?format=ndjson streaming,
+    ?sort=channel|pubDate|title&order=asc|desc, full-text ?q= search and the filters channel, feedurl,
+    origin, starred, unread, is_clickbait (true/false/pending), youtube, since and until.
+    ?format=columns (or msgpack, with the msgpack package installed) returns build_columnar_listing();
+    Accept can select any of the formats in LISTING_FORMATS too.
+    """
+    return respond_with_items()
+
+@app.route('/api/items/unqualified', methods=['GET', 'OPTIONS'])
+def get_pending_clickbait_items():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    return respond_with_items(only_pending_clickbait=True)
+
+# /api/channels sort orders: name -> ORDER BY expression over the aggregate columns
+CHANNEL_SORTS = {
+    'channel': 'UPPER(rss_feed.title)',
+    'newest': 'stats.newest_pubDate',
+    'total': 'stats.total',
+    'unread': 'stats.unread',
+    'starred': 'stats.starred',
+    'pending_clickbait': 'stats.pending_clickbait',
+}
+
+def get_channel_stats(sort='channel', descending=False):
+    """Per-feed counts of live items, from one GROUP BY over idx_rss_item_live_feedurl without touching rss_item rows."""
+    direction = 'DESC' if descending else 'ASC'
+    cursor = get_db().execute(f"""
+        SELECT
+            stats.feedurl,
+            rss_feed.title AS channel_name,
+            rss_feed.url AS channel_url,
+            rss_feed.lastmodified,
+            stats.total,
+            stats.unread,
+            stats.starred,
+            stats.pending_clickbait,
+            stats.newest_pubDate
+        FROM (
+            SELECT
+                rss_item.feedurl,
+                COUNT(*) AS total,
+                SUM(rss_item.unread) AS unread,
+                SUM({STARRED_CONDITION}) AS starred,
+                SUM({PENDING_CLICKBAIT_CONDITION}) AS pending_clickbait,
+                MAX(rss_item.pubDate) AS newest_pubDate
+            FROM rss_item INDEXED BY idx_rss_item_live_feedurl
+            WHERE rss_item.deleted = 0
+            GROUP BY rss_item.feedurl
+        ) AS stats
+        INNER JOIN rss_feed ON rss_feed.rssurl = stats.feedurl
+        ORDER BY {CHANNEL_SORTS[sort]} {direction}, stats.feedurl {direction}
+    """)
+
+    channels = []
+    for row in cursor:
+        channel = dict(row)
+        channel['newest_pubDate'] = datetime.fromtimestamp(row['newest_pubDate']).strftime('%Y-%m-%d %H:%M:%S')
+        channels.append(channel)
+    return channels
+
+@app.route('/api/channels', methods=['GET', 'OPTIONS'])
+def get_channels():
+    """List feeds that have live items, with total, unread, starred and pending clickbait counts and the newest pubDate.
+
+    Supports ?sort=channel|newest|total|unread|starred|pending_clickbait&order=asc|desc.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    sort = request.args.get('sort', 'channel')
+    order = request.args.get('order', 'asc')
+    if sort not in CHANNEL_SORTS or order not in ('asc', 'desc'):
         return jsonify({
+            'status': 'error',
+            'message': f"sort must be one of: {', '.join(CHANNEL_SORTS)}; order must be asc or desc"
+        }), 400
+
+    change_token = get_change_token()
+    etag = listing_etag(change_token)
+    cached_etag = matching_etag(etag)
+    if cached_etag:
+        return not_modified(cached_etag)
+
+    try:
+        return make_conditional_listing(jsonify({
             'status': 'success',
-            'data': items
-        })
+            'data': get_channel_stats(sort, order == 'desc'),
+            'change_token': change_token
+        }), etag)
     except Exception as e:
+        print(f"Error in get_channels: {str(e)}")
         return jsonify({
             'status': 'error',
             'message': str(e)
         }), 500
 
-@app.route('/api/items/unqualified', methods=['GET', 'OPTIONS'])
-def get_pending_clickbait_items():
+# Feed URLs contain '//', which must not be merged into '/' before matching
+@app.route('/api/channels/<path:feedurl>/items', methods=['GET', 'OPTIONS'], merge_slashes=False)
+def get_channel_items(feedurl):
+    """List one feed's live items. The feed URL goes in the path percent-encoded; takes the /api/items parameters."""
     if request.method == 'OPTIONS':
         return '', 200
-        
+
+    if get_db().execute("SELECT 1 FROM rss_feed WHERE rssurl = ?", (feedurl,)).fetchone() is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Channel not found'
+        }), 404
+
+    return respond_with_items(filters=[("rss_item.feedurl = ?", [feedurl])])
+
+@app.route('/api/items/changes', methods=['GET', 'OPTIONS'])
+def get_item_changes():
+    """Items inserted, updated or deleted since a change token. Use ?since=<token> from a previous response."""
+    if request.method == 'OPTIONS':
+        return '', 200
+
     try:
-        items = get_non_deleted_items(only_pending_clickbait=True)
-        items = process_items(items)
+        since = int(request.args.get('since', ''))
+    except ValueError:
         return jsonify({
-            'status': 'success',
-            'data': items
-        })
-    except Exception as e:
+            'status': 'error',
+            'message': 'since is required and must be an integer change token'
+        }), 400
+
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
         return jsonify({
             'status': 'error',
             'message': str(e)
-        }), 500
+        }), 400
+
+    token = get_change_token()
+    return jsonify({
+        'status': 'success',
+        'data': get_change_delta(since, token, fields)
+    })
+
+def get_change_delta(since, token, fields=DEFAULT_ITEM_FIELDS):
+    """The changes between two change tokens, with the current state of inserted and updated items."""
+    if token == since:
+        return {'token': token, 'reset': False, 'inserted': [], 'updated': [], 'deleted': [], 'items': []}
+
+    changes = get_changes_since(since)
+    if changes is None:
+        # The log has been pruned past since; the client has to reload the full listing
+        return {'token': token, 'reset': True, 'inserted': [], 'updated': [], 'deleted': [], 'items': []}
+
+    inserted, updated, deleted = changes
+    return {
+        'token': token,
+        'reset': False,
+        'inserted': inserted,
+        'updated': updated,
+        'deleted': deleted,
+        'items': get_non_deleted_items_by_ids(inserted + updated, fields)
+    }
+
+class EventBroadcaster:
+    """Wakes /api/events streams and carries events that have no change log entry, like DeArrow titles.
+
+    Item changes are not published here; streams read them from the change log, which also sees newsboat's writes.
+    """
+
+    def __init__(self, backlog=1000):
+        self._condition = threading.Condition()
+        self._events = collections.deque(maxlen=backlog)
+        self._seq = 0
+        self._streams = 0
+        self.closed = False
+
+    @property
+    def seq(self):
+        with self._condition:
+            return self._seq
+
+    def publish(self, name, data):
+        with self._condition:
+            self._seq += 1
+            self._events.append((self._seq, name, data))
+            self._condition.notify_all()
+
+    def wake(self):
+        with self._condition:
+            self._condition.notify_all()
+
+    def close(self):
+        """End every open stream at its next wake-up so shutdown isn't held by idle /api/events clients."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def wait(self, after_seq, timeout):
+        """Block until woken, an event after after_seq is published or timeout passes. Returns the events after after_seq."""
+        with self._condition:
+            if self._seq == after_seq and not self.closed:
+                self._condition.wait(timeout)
+            return [event for event in self._events if event[0] > after_seq]
+
+    def open_stream(self, limit):
+        with self._condition:
+            if self._streams >= limit:
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        with self._condition:
+            self._streams -= 1
+
+event_broadcaster = EventBroadcaster()
+
+# Streams end after this long and the browser reconnects with Last-Event-ID, so a waitress thread is never held forever
+EVENT_STREAM_SECONDS = 5 * 60
+EVENT_KEEPALIVE_SECONDS = 15
+
+def format_event(name, data, event_id=None):
+    lines = [f'event: {name}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"))}')
+    return '\n'.join(lines) + '\n\n'
+
+def stream_events(since, fields):
+    """Yield server-sent events: item deltas from the change log plus published DeArrow titles.
+
+    A pooled connection is only held while checking the change log, not for the life of the stream.
+    """
+    if not event_broadcaster.open_stream(args.max_event_streams):
+        # Every stream occupies a server thread; tell the page to fall back to manual refreshes for a while
+        yield 'retry: 60000\n' + format_event('busy', {'message': 'Too many open event streams'})
+        return
+
+    try:
+        event_seq = event_broadcaster.seq
+        with app.app_context():
+            token = get_change_token()
+        if since is None:
+            since = token
+        yield 'retry: 3000\n' + format_event('hello', {'token': since}, since)
+
+        deadline = time.monotonic() + EVENT_STREAM_SECONDS
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline and not event_broadcaster.closed:
+            if token != since:
+                with app.app_context():
+                    delta = get_change_delta(since, token, fields)
+                yield format_event('items', delta, token)
+                since = token
+                last_sent = time.monotonic()
+
+            for seq, name, data in event_broadcaster.wait(event_seq, args.event_poll_interval):
+                event_seq = seq
+                yield format_event(name, data)
+                last_sent = time.monotonic()
+
+            if time.monotonic() - last_sent >= EVENT_KEEPALIVE_SECONDS:
+                # Comment line; keeps proxies from timing out and surfaces closed connections
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+
+            with app.app_context():
+                token = get_change_token()
+    finally:
+        event_broadcaster.close_stream()
+
+@app.route('/api/events', methods=['GET'])
+def get_events():
+    """Server-sent events for open review pages.
+
+    event: items carries the same delta as /api/items/changes with the change token as event id;
+    event: dearrow carries {"results": {video_id: branding}} for titles fetched in the background.
+    Resumes from the Last-Event-ID header or ?since=<token>; without either, starts at the current token.
+    """
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        since = int(since) if since is not None else None
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'since must be an integer change token'
+        }), 400
+
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    response = Response(stream_events(since, fields), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class ItemCache:
+    """LRU of single item rows, so repeat lookups of the same item are answered from memory.
+
+    Every entry is stamped with the change log seq it reflects. A dedicated connection watches
+    PRAGMA data_version, which moves whenever any other connection (pooled or newsboat's) commits;
+    only then is the change log read, and entries of items changed after their seq are dropped.
+    Writes that return the row they changed put it back, so the server's own changes keep entries warm.
+    """
+
+    def __init__(self, db_path, max_size):
+        self.db_path = db_path
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._watch = None
+        self._data_version = None
+        self._synced_seq = 0
+
+    def _sync(self):
+        """Drop entries the change log has newer changes for. Called with _lock held."""
+        if self._watch is None:
+            self._watch = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._watch.execute(f"PRAGMA busy_timeout = {args.busy_timeout}")
+
+        data_version = self._watch.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+
+        # One read transaction, so the pruning check and the changes come from the same snapshot
+        self._watch.execute("BEGIN")
+        try:
+            floor, latest = get_change_log_range(self._watch)
+            if self._synced_seq < floor:
+                self._entries.clear()
+            else:
+                changed = self._watch.execute("""
+                    SELECT item_id, MAX(seq) FROM nbserver_item_change WHERE seq > ? GROUP BY item_id
+                """, (self._synced_seq,))
+                for item_id, seq in changed:
+                    entry = self._entries.get(item_id)
+                    if entry is not None and entry[0] < seq:
+                        del self._entries[item_id]
+            self._synced_seq = max(self._synced_seq, latest)
+        finally:
+            self._watch.execute("COMMIT")
+
+    def get(self, item_id):
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(item_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(item_id)
+            return entry[1]
+
+    def put(self, item_id, change_seq, item):
+        with self._lock:
+            # Changes between change_seq and the last sync were skipped for this item, so the row may be stale already
+            if change_seq < self._synced_seq:
+                return
+            self._entries[item_id] = (change_seq, item)
+            self._entries.move_to_end(item_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, item_id):
+        with self._lock:
+            self._entries.pop(item_id, None)
+
+    def close(self):
+        with self._lock:
+            if self._watch is not None:
+                self._watch.close()
+                self._watch = None
+
+# Created by create_app() unless --item-cache-size is 0
+item_cache = None
+
+# Columns of a single item response; writes return them too so they can refresh item_cache
+ITEM_COLUMNS = 'id, author, title, url, deleted, unread, pubDate, content, feedurl, flags'
+
+def item_from_row(row):
+    return {
+        'id': row['id'],
+        'author': row['author'],
+        'title': row['title'],
+        'url': row['url'],
+        'deleted': row['deleted'],
+        'unread': row['unread'],
+        # Convert Unix timestamp to human readable date
+        'pubDate': datetime.fromtimestamp(row['pubDate']).strftime('%Y-%m-%d %H:%M:%S'),
+        'content': row['content'],
+        'feedurl': row['feedurl'],
+        'flags': row['flags']
+    }
 
+def cache_written_item(row):
+    """Put a row returned by a write into item_cache. Call before committing: the write lock makes the latest seq this write's own."""
+    if item_cache is not None:
+        item_cache.put(row['id'], get_change_token(), item_from_row(row))
 
 def get_item_by_id(item_id):
-    """Fetch a single item by ID from the database."""
+    """Fetch a single item by ID, from item_cache when it has a current copy."""
+    if item_cache is not None:
+        item = item_cache.get(item_id)
+        if args.metrics:
+            metrics.inc('nbserver_item_cache_lookups_total', {'result': 'hit' if item is not None else 'miss'})
+        if item is not None:
+            return item
+
     try:
         conn = get_db()
         cursor = conn.cursor()
 
-        cursor.execute("""
+        # The change token comes from the same statement, so it matches the row exactly
+        cursor.execute(f"""
             SELECT 
-                id,
-                author,
-                title,
-                url,
-                deleted,
-                unread,
-                pubDate,
-                content,
-                feedurl,
-                flags
+                {ITEM_COLUMNS},
+                {CHANGE_TOKEN_SQL} AS change_seq
             FROM 
                 rss_item
             WHERE 
@@ -261,49 +1714,17 @@ def get_item_by_id(item_id):
         if row is None:
             return None
 
-        # Convert Unix timestamp to human readable date
-        pub_date = datetime.fromtimestamp(row['pubDate']).strftime('%Y-%m-%d %H:%M:%S')
-        
-        return {
-            'id': row['id'],
-            'author': row['author'],
-            'title': row['title'],
-            'url': row['url'],
-            'deleted': row['deleted'],
-            'unread': row['unread'],
-            'pubDate': pub_date,
-            'content': row['content'],
-            'feedurl': row['feedurl'],
-            'flags': row['flags']
-        }
+        item = item_from_row(row)
+        if item_cache is not None:
+            item_cache.put(item_id, row['change_seq'] or 0, item)
+        return item
     except Exception as e:
         print(f"Error in get_item_by_id: {str(e)}")
         return None
 
-def get_item_flags(item_id):
-    """Get the flags string for an item. Always returns a string, empty string if NULL or not found."""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT flags FROM rss_item WHERE id = ? AND deleted = 0", (item_id,))
-    row = cursor.fetchone()
-    if not row or row['flags'] is None:
-        return ''
-    return row['flags']
-
-def is_item_starred(item_id):
-    """Check if an item is starred (has 'S' flag)."""
-    flags = get_item_flags(item_id)
+def flags_have_star(flags):
     return 'S' in flags or 's' in flags
 
-def update_item_flags(item_id, flags_str):
-    """Update the flags for an item. Normalizes the flags before writing. Returns True if rows were updated."""
-    normalized = normalize_flags(flags_str)
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("UPDATE rss_item SET flags = ? WHERE id = ? AND deleted = 0", (normalized, item_id))
-    conn.commit()
-    return cursor.rowcount > 0
-
 def mark_item_as_deleted(item_id):
     """Mark an item as deleted in the database."""
     try:
@@ -318,6 +1739,8 @@ def mark_item_as_deleted(item_id):
         
         success = cursor.rowcount > 0
         conn.commit()
+        if item_cache is not None:
+            item_cache.discard(item_id)
         
         return success
     except Exception as e:
@@ -325,39 +1748,28 @@ def mark_item_as_deleted(item_id):
         return False
 
 def toggle_item_unread(item_id):
-    """Toggle the unread flag for an item in the database. If setting to unread=1 (unkept), also remove star."""
+    """Toggle the unread flag for an item in one statement. If setting to unread=1 (unkept), also remove star.
+
+    Returns the updated {'flags', 'unread'} row, or None if the item was not found.
+    """
     try:
         conn = get_db()
-        cursor = conn.cursor()
-
-        # Get current unread value
-        cursor.execute("SELECT unread FROM rss_item WHERE id = ? AND deleted = 0", (item_id,))
-        row = cursor.fetchone()
-        if not row:
-            return None
-        
-        current_unread = row['unread']
-        new_unread = 1 if current_unread == 0 else 0
-
-        # Toggle unread: unread = 1 -> 0, unread = 0 -> 1
-        cursor.execute("""
-            UPDATE rss_item
-            SET unread = ?
-            WHERE id = ? AND deleted = 0
-        """, (new_unread, item_id))
-        
-        success = cursor.rowcount > 0
-        
-        # If setting to unread=1 (unkept), remove the star
-        if success and new_unread == 1:
-            set_item_starred(item_id, False)
-        
-        conn.commit()
+        with conn:
+            cursor = conn.execute(f"""
+                UPDATE rss_item
+                SET unread = CASE WHEN unread = 0 THEN 1 ELSE 0 END,
+                    flags = CASE WHEN unread = 0 THEN remove_flag(flags, 'S') ELSE flags END
+                WHERE id = ? AND deleted = 0
+                RETURNING {ITEM_COLUMNS}
+            """, (item_id,))
+            row = cursor.fetchone()
+            if row is not None:
+                cache_written_item(row)
         
-        if not success:
+        if row is None:
             return None
 
-        return new_unread
+        return {'flags': row['flags'] or '', 'unread': row['unread']}
     except Exception as e:
         print(f"Error in toggle_item_unread: {str(e)}")
         return None
@@ -390,18 +1802,15 @@ def handle_delete_item(item_id):
 
 def handle_toggle_unread(item_id):
     """Handle POST request to toggle unread status for a single item."""
-    new_unread = toggle_item_unread(item_id)
-    if new_unread is not None:
-        # Get updated flags in case star was removed
-        updated_flags = get_item_flags(item_id)
-        is_starred = 'S' in updated_flags or 's' in updated_flags
+    updated = toggle_item_unread(item_id)
+    if updated is not None:
         return jsonify({
             'status': 'success',
             'message': 'Unread status updated successfully',
             'data': {
-                'unread': new_unread,
-                'flags': updated_flags,
-                'starred': is_starred
+                'unread': updated['unread'],
+                'flags': updated['flags'],
+                'starred': flags_have_star(updated['flags'])
             }
         })
     return jsonify({
@@ -409,46 +1818,37 @@ def handle_toggle_unread(item_id):
         'message': 'Item not found or failed to update'
     }), 404
 
-def remove_item_star_flag_only(item_id):
-    """Remove the 'S' flag from an item's flags (without changing unread status)."""
-    current_flags = get_item_flags(item_id)
-    new_flags = remove_flag(current_flags, 'S')
-    return update_item_flags(item_id, new_flags)
+def update_item_star(item_id, starred, unread=None):
+    """Add or remove the 'S' flag, optionally setting unread, in one statement.
 
-def set_item_star(item_id):
-    """Add the 'S' flag to an item's flags and set unread=0 (kept)."""
-    current_flags = get_item_flags(item_id)
-    new_flags = add_flag(current_flags, 'S')
-    flags_success = update_item_flags(item_id, new_flags)
-    
-    # Also set unread=0 (kept) when starring
-    if flags_success:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE rss_item SET unread = 0 WHERE id = ? AND deleted = 0", (item_id,))
-        conn.commit()
+    Returns the updated {'flags', 'unread'} row, or None if the item was not found.
+    """
+    flag_function = 'add_flag' if starred else 'remove_flag'
+    conn = get_db()
+    with conn:
+        cursor = conn.execute(f"""
+            UPDATE rss_item
+            SET flags = {flag_function}(flags, 'S'),
+                unread = COALESCE(?, unread)
+            WHERE id = ? AND deleted = 0
+            RETURNING {ITEM_COLUMNS}
+        """, (unread, item_id))
+        row = cursor.fetchone()
+        if row is not None:
+            cache_written_item(row)
     
-    return flags_success
+    if row is None:
+        return None
 
-def set_item_starred(item_id, starred):
-    """Set or unset the starred status for an item. Returns True if successful."""
-    if starred:
-        return set_item_star(item_id)
-    else:
-        return remove_item_star_flag_only(item_id)
+    return {'flags': row['flags'] or '', 'unread': row['unread']}
+
+def set_item_star(item_id):
+    """Add the 'S' flag to an item's flags and set unread=0 (kept)."""
+    return update_item_star(item_id, True, unread=0)
 
 def remove_item_star(item_id):
     """Remove the 'S' flag from an item's flags and set unread=1 (not kept)."""
-    flags_success = remove_item_star_flag_only(item_id)
-    
-    # Also set unread=1 (not kept) when unstarring
-    if flags_success:
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE rss_item SET unread = 1 WHERE id = ? AND deleted = 0", (item_id,))
-        conn.commit()
-    
-    return flags_success
+    return update_item_star(item_id, False, unread=1)
 
 @app.route('/api/items/<int:item_id>', methods=['GET', 'DELETE', 'POST', 'OPTIONS'])
 def handle_item(item_id):
@@ -476,142 +1876,352 @@ def handle_item_starred(item_id):
     if request.method == 'OPTIONS':
         return '', 200
     
-    # Verify item exists
-    item = get_item_by_id(item_id)
-    if item is None:
-        return jsonify({
-            'status': 'error',
-            'message': 'Item not found'
-        }), 404
-    
     if request.method == 'POST':
         # Set starred flag
-        success = set_item_star(item_id)
-        if success:
-            updated_flags = get_item_flags(item_id)
-            # Get updated unread status
-            conn = get_db()
-            cursor = conn.cursor()
-            cursor.execute("SELECT unread FROM rss_item WHERE id = ?", (item_id,))
-            row = cursor.fetchone()
-            unread_status = row['unread'] if row else None
-            return jsonify({
-                'status': 'success',
-                'message': 'Starred flag set successfully',
-                'data': {
-                    'flags': updated_flags,
-                    'starred': True,
-                    'unread': unread_status
-                }
-            }), 200
-        return jsonify({
-            'status': 'error',
-            'message': 'Failed to set starred flag'
-        }), 500
-    
+        updated = set_item_star(item_id)
+        message = 'Starred flag set successfully'
     elif request.method == 'DELETE':
         # Remove starred flag
-        success = remove_item_star(item_id)
-        if success:
-            updated_flags = get_item_flags(item_id)
-            # Get current unread status (unchanged when unstarring)
-            conn = get_db()
-            cursor = conn.cursor()
-            cursor.execute("SELECT unread FROM rss_item WHERE id = ?", (item_id,))
-            row = cursor.fetchone()
-            unread_status = row['unread'] if row else None
-            return jsonify({
-                'status': 'success',
-                'message': 'Starred flag removed successfully',
-                'data': {
-                    'flags': updated_flags,
-                    'starred': False,
-                    'unread': unread_status
-                }
-            }), 200
+        updated = remove_item_star(item_id)
+        message = 'Starred flag removed successfully'
+    else:
+        return jsonify({
+            'status': 'error',
+            'message': 'Method not allowed'
+        }), 405
+    
+    if updated is None:
         return jsonify({
             'status': 'error',
-            'message': 'Failed to remove starred flag'
-        }), 500
+            'message': 'Item not found'
+        }), 404
     
     return jsonify({
-        'status': 'error',
-        'message': 'Method not allowed'
-    }), 405
+        'status': 'success',
+        'message': message,
+        'data': {
+            'flags': updated['flags'],
+            'starred': request.method == 'POST',
+            'unread': updated['unread']
+        }
+    }), 200
 
 def mark_items_as_deleted(item_ids):
-    """Mark multiple items as deleted in the database."""
+    """Mark multiple items as deleted in one transaction.
+
+    Returns {'deleted': [...], 'already_deleted': [...], 'not_found': [...]} with each distinct id
+    in exactly one list, or None on error.
+    """
     try:
         conn = get_db()
         cursor = conn.cursor()
-
-        # Create a parameterized query with the correct number of placeholders
-        placeholders = ','.join('?' * len(item_ids))
-        cursor.execute(f"""
-            UPDATE rss_item 
-            SET deleted = 1 
-            WHERE id IN ({placeholders})
-        """, item_ids)
-        
-        success = cursor.rowcount > 0
-        conn.commit()
-        
-        return success
+        with conn, temp_key_table(cursor, 'nbserver_delete_ids', item_ids) as keys:
+            # Writing first takes the write lock, so the lookup below sees the same state
+            cursor.execute(f"""
+                UPDATE rss_item
+                SET deleted = 1
+                WHERE id IN (SELECT key FROM {keys})
+                AND deleted = 0
+                RETURNING id
+            """)
+            deleted = {row['id'] for row in cursor}
+
+            cursor.execute(f"""
+                SELECT requested.key AS id, rss_item.id IS NOT NULL AS found
+                FROM {keys} AS requested
+                LEFT JOIN rss_item ON rss_item.id = requested.key
+            """)
+            outcomes = {'deleted': [], 'already_deleted': [], 'not_found': []}
+            for row in cursor:
+                if row['id'] in deleted:
+                    outcomes['deleted'].append(row['id'])
+                elif row['found']:
+                    outcomes['already_deleted'].append(row['id'])
+                else:
+                    outcomes['not_found'].append(row['id'])
+        return outcomes
     except Exception as e:
         print(f"Error in mark_items_as_deleted: {str(e)}")
-        return False
-
-@app.route('/api/items/batch-delete', methods=['POST', 'OPTIONS'])
-def handle_batch_delete():
-    """Handle batch deletion of multiple items."""
-    if request.method == 'OPTIONS':
-        return '', 200
+        return None
 
+def validate_item_ids_request():
+    """Validate and extract item_ids from request. Returns (item_ids, error_response)."""
     if not request.is_json:
-        return jsonify({
+        return None, (jsonify({
             'status': 'error',
             'message': 'Request must be JSON'
-        }), 400
+        }), 400)
 
     data = request.get_json()
     if not isinstance(data, dict) or 'item_ids' not in data:
-        return jsonify({
+        return None, (jsonify({
             'status': 'error',
             'message': 'Request must include item_ids array'
-        }), 400
+        }), 400)
 
     item_ids = data['item_ids']
     if not isinstance(item_ids, list):
-        return jsonify({
+        return None, (jsonify({
             'status': 'error',
             'message': 'item_ids must be an array'
-        }), 400
+        }), 400)
 
     if not all(isinstance(id, int) for id in item_ids):
-        return jsonify({
+        return None, (jsonify({
             'status': 'error',
             'message': 'All item IDs must be integers'
-        }), 400
+        }), 400)
+
+    return item_ids, None
+
+@app.route('/api/items/batch-delete', methods=['POST', 'OPTIONS'])
+def handle_batch_delete():
+    """Handle batch deletion of multiple items."""
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    item_ids, error_response = validate_item_ids_request()
+    if error_response:
+        response, status_code = error_response
+        return response, status_code
 
-    if mark_items_as_deleted(item_ids):
+    outcomes = mark_items_as_deleted(item_ids)
+    if outcomes is not None:
         return jsonify({
             'status': 'success',
-            'message': f'Successfully deleted {len(item_ids)} items'
+            'message': f"Successfully deleted {len(outcomes['deleted'])} items",
+            'data': {
+                'deleted_count': len(outcomes['deleted']),
+                'already_deleted_count': len(outcomes['already_deleted']),
+                'not_found_count': len(outcomes['not_found']),
+                **outcomes
+            }
         })
     return jsonify({
         'status': 'error',
         'message': 'Failed to delete items'
     }), 500
 
+def get_items_content(item_ids):
+    """Fetch the content column for multiple non-deleted items. Returns a dict of id -> content."""
+    if not item_ids:
+        return {}
+
+    cursor = get_db().cursor()
+    contents = {}
+    for chunk in chunked(item_ids):
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f"""
+            SELECT id, content
+            FROM rss_item
+            WHERE id IN ({placeholders})
+            AND deleted = 0
+        """, chunk)
+        contents.update((row['id'], row['content']) for row in cursor)
+    return contents
+
+@app.route('/api/items/content', methods=['POST', 'OPTIONS'])
+def handle_items_content():
+    """Fetch content for the given items, for listings requested without it. Request body: {"item_ids": [...]}"""
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    item_ids, error_response = validate_item_ids_request()
+    if error_response:
+        response, status_code = error_response
+        return response, status_code
+
+    try:
+        return jsonify({
+            'status': 'success',
+            'data': get_items_content(item_ids)
+        })
+    except Exception as e:
+        print(f"Error in handle_items_content: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
 @app.route('/api/maintenance/prepare', methods=['GET'])
 def maintenance_prepare():
     """Prompt from a external script to prepare database. Perform any maintenance tasks here."""
     changed_count = populate_youtube_ids()
+    populate_channel_keys()
+    refresh_search_index()
+    prune_change_log()
+    prune_dearrow_cache()
+    queued_count = enqueue_dearrow_prefetch()
     return jsonify({
         'status': 'success',
-        'message': f'Updated {changed_count} records with youtube id',
+        'message': f'Updated {changed_count} records with youtube id, queued {queued_count} for DeArrow prefetch',
     })
 
+# Items archived per transaction, so newsboat is never locked out for long
+ARCHIVE_BATCH_SIZE = 500
+
+def get_archive_path():
+    return args.archive_db or f"{os.path.splitext(args.db)[0]}.archive.db"
+
+def open_archive():
+    """Connect to the archive database, creating its table on first use."""
+    archive = sqlite3.connect(get_archive_path())
+    archive.execute("""
+        CREATE TABLE IF NOT EXISTS archived_item (
+            id INTEGER PRIMARY KEY,
+            guid TEXT NOT NULL,
+            feedurl TEXT NOT NULL,
+            url TEXT NOT NULL,
+            title TEXT,
+            author TEXT,
+            pubDate INTEGER,
+            flags TEXT,
+            youtube_id TEXT,
+            is_clickbait INTEGER,
+            rebait_title TEXT,
+            content BLOB,
+            archived_at INTEGER NOT NULL
+        )
+    """)
+    return archive
+
+def archive_deleted_items(days):
+    """Move the content of deleted items published more than days ago to the archive database.
+
+    The rss_item rows stay behind with empty content: newsboat recognizes items by guid and would
+    download them again as new if the rows were gone. Content is stored zlib compressed.
+    Returns (archived item count, content bytes removed from the cache).
+    """
+    cutoff = int(time.time()) - days * 24 * 60 * 60
+    conn = get_db()
+    archive = open_archive()
+    archived_count = freed_bytes = 0
+    try:
+        while True:
+            rows = conn.execute("""
+                SELECT id, guid, feedurl, url, title, author, pubDate, flags, youtube_id, is_clickbait, rebait_title, content
+                FROM rss_item INDEXED BY idx_rss_item_archivable
+                WHERE deleted = 1 AND content != '' AND pubDate < ?
+                LIMIT ?
+            """, (cutoff, ARCHIVE_BATCH_SIZE)).fetchall()
+            if not rows:
+                break
+
+            # Archive first: if the cache update below fails, the next run archives the same rows again
+            now = int(time.time())
+            contents = [str(row['content']).encode('utf-8') for row in rows]
+            with archive:
+                archive.executemany("""
+                    INSERT OR REPLACE INTO archived_item
+                    (id, guid, feedurl, url, title, author, pubDate, flags, youtube_id, is_clickbait, rebait_title, content, archived_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, [(*tuple(row)[:-1], zlib.compress(content), now) for row, content in zip(rows, contents)])
+            with conn:
+                conn.executemany("UPDATE rss_item SET content = '' WHERE id = ? AND deleted = 1", [(row['id'],) for row in rows])
+
+            archived_count += len(rows)
+            freed_bytes += sum(len(content) for content in contents)
+    finally:
+        archive.close()
+    return archived_count, freed_bytes
+
+def database_size():
+    """Size in bytes of the database file including its WAL."""
+    return sum(os.path.getsize(path) for path in (args.db, args.db + '-wal') if os.path.exists(path))
+
+@app.route('/api/maintenance/archive', methods=['POST'])
+def maintenance_archive():
+    """Archive deleted items older than ?days= (default --archive-after-days). ?vacuum=true compacts the cache file afterwards."""
+    try:
+        days = int(request.args.get('days', args.archive_after_days))
+        if days < 0:
+            raise ValueError
+        vacuum = parse_bool_arg('vacuum', request.args.get('vacuum', 'false'))
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'days must be a non-negative integer and vacuum true or false'
+        }), 400
+
+    try:
+        started = time.monotonic()
+        size_before = database_size()
+        archived_count, freed_bytes = archive_deleted_items(days)
+        if vacuum:
+            conn = get_db()
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return jsonify({
+            'status': 'success',
+            'message': f'Archived {archived_count} deleted items older than {days} days',
+            'data': {
+                'archived_count': archived_count,
+                'content_bytes': freed_bytes,
+                'archive_path': get_archive_path(),
+                'database_bytes_before': size_before,
+                'database_bytes_after': database_size(),
+                'vacuumed': vacuum,
+                'seconds': round(time.monotonic() - started, 3)
+            }
+        })
+    except Exception as e:
+        print(f"Error in maintenance_archive: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+# Progress of the startup backfill, reported by /api/health
+startup_state = {
+    'schema_version': None,
+    'migrated': False,
+    'backfill': 'pending',
+    'backfill_started_at': None,
+    'backfill_finished_at': None,
+    'error': None
+}
+backfill_thread = None
+
+def run_startup_backfill():
+    """Catch up derived columns and the search index with whatever newsboat wrote while nbserver was down."""
+    startup_state['backfill'] = 'running'
+    startup_state['backfill_started_at'] = int(time.time())
+    try:
+        with app.app_context():
+            populate_youtube_ids()
+            populate_channel_keys()
+            refresh_search_index()
+        startup_state['backfill'] = 'done'
+    except Exception as e:
+        print(f"Error in startup backfill: {e}")
+        startup_state['backfill'] = 'failed'
+        startup_state['error'] = str(e)
+    startup_state['backfill_finished_at'] = int(time.time())
+
+def start_background_tasks():
+    """Start the backfill and the DeArrow prefetch worker; called once the server is listening."""
+    global backfill_thread
+    backfill_thread = threading.Thread(target=run_startup_backfill, name='startup-backfill', daemon=True)
+    backfill_thread.start()
+    prefetch_worker.start()
+
+@app.route('/api/health', methods=['GET'])
+def get_health():
+    """Readiness check: 200 once the startup backfill is done, 503 before that or if it failed."""
+    state = dict(startup_state)
+    ready = state['backfill'] == 'done'
+    if state['backfill'] == 'failed':
+        status, message = 'error', f"Startup backfill failed: {state['error']}"
+    elif ready:
+        status, message = 'success', 'Ready'
+    else:
+        status, message = 'starting', 'Startup backfill is still running'
+    return jsonify({
+        'status': status,
+        'message': message,
+        'data': {'ready': ready, **state}
+    }), 200 if ready else 503
+
 def validate_clickbait_request():
     """Validate and extract youtube_ids and is_clickbait from request. Returns (youtube_ids, is_clickbait, error_response)."""
     if not request.is_json:
@@ -636,53 +2246,78 @@ def validate_clickbait_request():
             'message': 'All YouTube IDs must be non-empty strings'
         }), 400)
     
-    if not isinstance(is_clickbait, bool):
+    # null clears the verdict, but leaving the field out is still an error
+    if 'is_clickbait' not in data or (is_clickbait is not None and not isinstance(is_clickbait, bool)):
         return None, None, (jsonify({
             'status': 'error',
-            'message': 'is_clickbait is required and must be a boolean (true or false)'
+            'message': 'is_clickbait is required and must be true, false or null'
         }), 400)
     
     return youtube_ids, is_clickbait, None
 
 def batch_set_clickbait_by_youtube_ids(youtube_ids, is_clickbait_value):
-    """Update is_clickbait for items matching the given YouTube IDs using indexed lookup."""
+    """Update is_clickbait for non-deleted items matching the given YouTube IDs in one transaction.
+
+    Besides the updated row count, sorts each distinct youtube_id into 'updated_ids',
+    'deleted_ids' (only deleted items have it) or 'not_found_ids'.
+    """
+    outcomes = {'updated': 0, 'errors': [], 'updated_ids': [], 'deleted_ids': [], 'not_found_ids': []}
     if not youtube_ids:
-        return {'updated': 0, 'errors': []}
-    
+        return outcomes
+
     conn = get_db()
     cursor = conn.cursor()
-    
-    placeholders = ','.join('?' * len(youtube_ids))
-    
-    cursor.execute(f"""
-        UPDATE rss_item
-        SET is_clickbait = ?
-        WHERE youtube_id IN ({placeholders})
-        AND deleted = 0
-    """, [is_clickbait_value] + youtube_ids)
-    
-    updated_count = cursor.rowcount
-    conn.commit()
-    
-    return {'updated': updated_count, 'errors': []}
+    with conn, temp_key_table(cursor, 'nbserver_youtube_ids', youtube_ids) as keys:
+        cursor.execute(f"""
+            UPDATE rss_item
+            SET is_clickbait = ?
+            WHERE youtube_id IN (SELECT key FROM {keys})
+            AND deleted = 0
+            RETURNING youtube_id
+        """, (is_clickbait_value,))
+        updated_rows = [row['youtube_id'] for row in cursor]
+        outcomes['updated'] = len(updated_rows)
+        updated = set(updated_rows)
+
+        # Recorded for every requested id, so items newsboat adds for these videos later are judged already
+        cursor.executemany(VERDICT_WRITE_THROUGH['is_clickbait'], [(is_clickbait_value, youtube_id) for youtube_id in dict.fromkeys(youtube_ids)])
+
+        cursor.execute(f"""
+            SELECT requested.key AS youtube_id, EXISTS (
+                SELECT 1 FROM rss_item WHERE rss_item.youtube_id = requested.key
+            ) AS found
+            FROM {keys} AS requested
+        """)
+        for row in cursor:
+            if row['youtube_id'] in updated:
+                outcomes['updated_ids'].append(row['youtube_id'])
+            elif row['found']:
+                outcomes['deleted_ids'].append(row['youtube_id'])
+            else:
+                outcomes['not_found_ids'].append(row['youtube_id'])
+
+    return outcomes
 
 @app.route('/api/items/set-is-clickbait', methods=['POST'])
 def set_clickbait():
-    """Set clickbait status for items based on YouTube IDs. Request body: {"youtube_ids": [...], "is_clickbait": true/false}"""
+    """Set clickbait status for items based on YouTube IDs. Request body: {"youtube_ids": [...], "is_clickbait": true/false/null}"""
     
     youtube_ids, is_clickbait, error_response = validate_clickbait_request()
     if error_response:
         response, status_code = error_response
         return response, status_code
     
-    is_clickbait_value = 1 if is_clickbait else 0
+    is_clickbait_value = None if is_clickbait is None else int(is_clickbait)
     result = batch_set_clickbait_by_youtube_ids(youtube_ids, is_clickbait_value)
     
     return jsonify({
         'status': 'success',
         'message': f'Updated {result["updated"]} items',
         'data': {
-            'updated_count': result['updated']
+            'updated_count': result['updated'],
+            'updated': result['updated_ids'],
+            'deleted': result['deleted_ids'],
+            'not_found': result['not_found_ids']
         }
     })
 
@@ -725,6 +2360,7 @@ def set_rebait_title_by_youtube_id(youtube_id, rebait_title):
     """, (rebait_title, youtube_id))
     
     updated_count = cursor.rowcount
+    cursor.execute(VERDICT_WRITE_THROUGH['rebait_title'], (rebait_title, youtube_id))
     conn.commit()
     
     return {'updated': updated_count, 'errors': []}
@@ -748,23 +2384,362 @@ def set_rebait_title():
         }
     })
 
+# Verdicts set through the item endpoints are written to clickbait_verdict too. Parameters: (value, youtube_id).
+# Setting is_clickbait by hand clears the model, since no model made that verdict.
+VERDICT_WRITE_THROUGH = {
+    'is_clickbait': """
+        INSERT INTO clickbait_verdict (youtube_id, verdict, judged_at)
+        VALUES (?2, ?1, CAST(strftime('%s', 'now') AS INTEGER))
+        ON CONFLICT (youtube_id) DO UPDATE SET
+            verdict = excluded.verdict,
+            model = NULL,
+            model_version = NULL,
+            judged_at = excluded.judged_at
+    """,
+    'rebait_title': """
+        INSERT INTO clickbait_verdict (youtube_id, rebait_title, judged_at)
+        VALUES (?2, ?1, CAST(strftime('%s', 'now') AS INTEGER))
+        ON CONFLICT (youtube_id) DO UPDATE SET rebait_title = excluded.rebait_title
+    """,
+}
+
+def validate_verdicts_request():
+    """Validate and extract the verdicts list from request. Returns (verdicts, error_response)."""
+    if not request.is_json:
+        return None, (jsonify({
+            'status': 'error',
+            'message': 'Request must be JSON'
+        }), 400)
 
-def process_items(items):
-    #items = process_dearrow(items)
-    items = process_add_origin(items)
-    #items = process_add_youtube_id(items)
-    return items
+    data = request.get_json()
+    verdicts = data.get('verdicts') if isinstance(data, dict) else None
+    if not isinstance(verdicts, list):
+        return None, (jsonify({
+            'status': 'error',
+            'message': 'Request must include verdicts array'
+        }), 400)
 
-def process_add_origin(items):
-    for item in items:
-        item['origin'] = determine_origin(item['url'])
-    return items
+    for index, verdict in enumerate(verdicts):
+        error = None
+        if not isinstance(verdict, dict):
+            error = 'verdict must be an object'
+        elif not isinstance(verdict.get('youtube_id'), str) or not verdict['youtube_id']:
+            error = 'youtube_id is required and must be a non-empty string'
+        elif verdict.get('is_clickbait') is not None and not isinstance(verdict['is_clickbait'], bool):
+            error = 'is_clickbait must be a boolean or null'
+        elif any(verdict.get(field) is not None and not isinstance(verdict[field], str) for field in ('rebait_title', 'model', 'model_version')):
+            error = 'rebait_title, model and model_version must be strings or null'
+        elif verdict.get('judged_at') is not None and (not isinstance(verdict['judged_at'], int) or isinstance(verdict['judged_at'], bool)):
+            error = 'judged_at must be epoch seconds'
+        if error:
+            return None, (jsonify({
+                'status': 'error',
+                'message': f'verdicts[{index}]: {error}'
+            }), 400)
+
+    return verdicts, None
+
+def upsert_verdicts(verdicts):
+    """Insert or replace whole verdict records in one transaction.
+
+    The items' own is_clickbait and rebait_title are set to match, so a null in the verdict
+    clears the value rather than letting listings fall back to an older one on the row.
+    Returns the number of verdicts written and of live items they apply to.
+    """
+    now = int(time.time())
+    rows = {}
+    for verdict in verdicts:
+        is_clickbait = verdict.get('is_clickbait')
+        # A later entry for the same youtube_id replaces an earlier one
+        rows[verdict['youtube_id']] = (
+            verdict['youtube_id'],
+            None if is_clickbait is None else int(is_clickbait),
+            verdict.get('rebait_title'),
+            verdict.get('model'),
+            verdict.get('model_version'),
+            verdict.get('judged_at') or now
+        )
 
-def process_add_youtube_id(items):
-    for item in items:
-        if youtube_id := extract_youtube_video_id(item['url']):
-            item['youtube_id'] = youtube_id
-    return items
+    conn = get_db()
+    cursor = conn.cursor()
+    with conn:
+        cursor.executemany("""
+            INSERT INTO clickbait_verdict (youtube_id, verdict, rebait_title, model, model_version, judged_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (youtube_id) DO UPDATE SET
+                verdict = excluded.verdict,
+                rebait_title = excluded.rebait_title,
+                model = excluded.model,
+                model_version = excluded.model_version,
+                judged_at = excluded.judged_at
+        """, list(rows.values()))
+        cursor.executemany("""
+            UPDATE rss_item
+            SET is_clickbait = ?2, rebait_title = ?3
+            WHERE youtube_id = ?1
+            AND deleted = 0
+            AND (is_clickbait IS NOT ?2 OR rebait_title IS NOT ?3)
+        """, [row[:3] for row in rows.values()])
+
+        with temp_key_table(cursor, 'nbserver_youtube_ids', rows) as keys:
+            cursor.execute(f"""
+                SELECT COUNT(*) FROM rss_item
+                WHERE youtube_id IN (SELECT key FROM {keys})
+                AND deleted = 0
+            """)
+            matched = cursor.fetchone()[0]
+
+    return {'upserted': len(rows), 'matched_items': matched}
+
+@app.route('/api/verdicts', methods=['POST', 'OPTIONS'])
+def handle_verdicts():
+    """Record clickbait verdicts by YouTube ID, whether or not an item for the video exists yet.
+
+    Request body: {"verdicts": [{"youtube_id": "id", "is_clickbait": true, "rebait_title": "title" or null,
+    "model": "name", "model_version": "version", "judged_at": epoch seconds (default now)}, ...]}
+    Each verdict replaces any earlier record for its youtube_id. Judged videos drop out of /api/items/unqualified.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    verdicts, error_response = validate_verdicts_request()
+    if error_response:
+        response, status_code = error_response
+        return response, status_code
+
+    try:
+        result = upsert_verdicts(verdicts)
+    except Exception as e:
+        print(f"Error in upsert_verdicts: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    return jsonify({
+        'status': 'success',
+        'message': f"Recorded {result['upserted']} verdicts",
+        'data': result
+    })
+
+# Operations accepted by /api/items/batch: op -> (key field, value field, UPDATE statement).
+# Statements take (value, key) parameters, or just (key,) when there is no value field.
+BATCH_OPERATIONS = {
+    'star': ('id', None, "UPDATE rss_item SET flags = add_flag(flags, 'S'), unread = 0 WHERE id = ? AND deleted = 0"),
+    'unstar': ('id', None, "UPDATE rss_item SET flags = remove_flag(flags, 'S'), unread = 1 WHERE id = ? AND deleted = 0"),
+    'keep': ('id', None, "UPDATE rss_item SET unread = 0 WHERE id = ? AND deleted = 0"),
+    'unkeep': ('id', None, "UPDATE rss_item SET unread = 1, flags = remove_flag(flags, 'S') WHERE id = ? AND deleted = 0"),
+    'delete': ('id', None, "UPDATE rss_item SET deleted = 1 WHERE id = ? AND deleted = 0"),
+    'set_clickbait': ('youtube_id', 'is_clickbait', "UPDATE rss_item SET is_clickbait = ? WHERE youtube_id = ? AND deleted = 0"),
+    'set_rebait_title': ('youtube_id', 'rebait_title', "UPDATE rss_item SET rebait_title = ? WHERE youtube_id = ? AND deleted = 0"),
+}
+
+# Largest IN (...) list built in one statement, well under SQLite's host parameter limit
+MAX_IN_PARAMS = 500
+
+def chunked(values, size=MAX_IN_PARAMS):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+@contextmanager
+def temp_key_table(cursor, name, keys):
+    """Load keys into a connection-private temp table to join against. Yields the qualified table name.
+
+    Unlike an IN (...) list this has no parameter limit and no per-statement planning cost,
+    so bulk updates stay linear in the number of keys. Duplicate keys are stored once.
+    Use inside the caller's transaction; the table is emptied again on exit.
+    """
+    table = f'temp.{name}'
+    cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {name} (key PRIMARY KEY) WITHOUT ROWID")
+    cursor.execute(f"DELETE FROM {table}")
+    cursor.executemany(f"INSERT OR IGNORE INTO {table} (key) VALUES (?)", ((key,) for key in keys))
+    try:
+        yield table
+    finally:
+        cursor.execute(f"DELETE FROM {table}")
+
+def validate_batch_operation(operation):
+    """Validate one batch operation. Returns an error message, or None if it is valid."""
+    if not isinstance(operation, dict):
+        return 'operation must be an object'
+
+    op = operation.get('op')
+    if op not in BATCH_OPERATIONS:
+        return f"op must be one of: {', '.join(BATCH_OPERATIONS)}"
+
+    key_field, value_field, _ = BATCH_OPERATIONS[op]
+    key = operation.get(key_field)
+    if key_field == 'id' and (not isinstance(key, int) or isinstance(key, bool)):
+        return 'id is required and must be an integer'
+    if key_field == 'youtube_id' and (not isinstance(key, str) or not key):
+        return 'youtube_id is required and must be a non-empty string'
+
+    if value_field == 'is_clickbait' and ('is_clickbait' not in operation or (
+            operation['is_clickbait'] is not None and not isinstance(operation['is_clickbait'], bool))):
+        return 'is_clickbait is required and must be true, false or null'
+    if value_field == 'rebait_title' and operation.get('rebait_title') is not None and not isinstance(operation.get('rebait_title'), str):
+        return 'rebait_title must be a string or null'
+
+    return None
+
+def validate_batch_request():
+    """Validate and extract the operations list from request. Returns (operations, error_response)."""
+    if not request.is_json:
+        return None, (jsonify({
+            'status': 'error',
+            'message': 'Request must be JSON'
+        }), 400)
+
+    data = request.get_json()
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list):
+        return None, (jsonify({
+            'status': 'error',
+            'message': 'Request must include operations array'
+        }), 400)
+
+    for index, operation in enumerate(operations):
+        error = validate_batch_operation(operation)
+        if error:
+            return None, (jsonify({
+                'status': 'error',
+                'message': f'operations[{index}]: {error}'
+            }), 400)
+
+    return operations, None
+
+def count_live_items_by_key(cursor, key_field, keys):
+    """Count non-deleted rows per key (item id or youtube_id)."""
+    counts = {}
+    for chunk in chunked(list(set(keys))):
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f"""
+            SELECT {key_field} AS key, COUNT(*) AS count
+            FROM rss_item
+            WHERE {key_field} IN ({placeholders})
+            AND deleted = 0
+            GROUP BY {key_field}
+        """, chunk)
+        counts.update((row['key'], row['count']) for row in cursor)
+    return counts
+
+def operation_params(operation):
+    key_field, value_field, _ = BATCH_OPERATIONS[operation['op']]
+    if value_field is None:
+        return (operation[key_field],)
+    value = operation.get(value_field)
+    if value_field == 'is_clickbait' and value is not None:
+        value = int(value)
+    return (value, operation[key_field])
+
+def apply_batch_operations(operations):
+    """Apply operations in order within one transaction. Returns a result dict per operation.
+
+    Consecutive operations of the same kind are written with a single executemany.
+    Results of item id operations carry the item's state as that operation left it.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    results = []
+
+    with conn:
+        start = 0
+        while start < len(operations):
+            op = operations[start]['op']
+            end = start
+            while end < len(operations) and operations[end]['op'] == op:
+                end += 1
+            run = operations[start:end]
+
+            key_field, value_field, statement = BATCH_OPERATIONS[op]
+            live_counts = count_live_items_by_key(cursor, key_field, [operation[key_field] for operation in run])
+            params = [operation_params(operation) for operation in run]
+            cursor.executemany(statement, params)
+            if value_field in VERDICT_WRITE_THROUGH:
+                cursor.executemany(VERDICT_WRITE_THROUGH[value_field], params)
+
+            run_results = []
+            for operation in run:
+                key = operation[key_field]
+                updated_count = live_counts.get(key, 0)
+                run_results.append({
+                    'op': op,
+                    key_field: key,
+                    'status': 'updated' if updated_count else 'not_found',
+                    'updated_count': updated_count
+                })
+                # A later operation on the same key sees the effect of this one
+                if op == 'delete':
+                    live_counts[key] = 0
+            if key_field == 'id':
+                # Repeating an id operation changes nothing, so the state after the run is the state after each one
+                attach_item_state(cursor, run_results)
+            results.extend(run_results)
+            start = end
+
+    return results
+
+def attach_item_state(cursor, results):
+    """Add the items' current flags/unread/deleted to results of item id operations."""
+    item_ids = list({result['id'] for result in results if 'id' in result})
+    state = {}
+    for chunk in chunked(item_ids):
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f"""
+            SELECT id, flags, unread, deleted
+            FROM rss_item
+            WHERE id IN ({placeholders})
+        """, chunk)
+        state.update((row['id'], row) for row in cursor)
+
+    for result in results:
+        row = state.get(result.get('id'))
+        if row is not None and result['status'] == 'updated':
+            flags = row['flags'] or ''
+            result.update({
+                'flags': flags,
+                'starred': flags_have_star(flags),
+                'unread': row['unread'],
+                'deleted': row['deleted']
+            })
+
+@app.route('/api/items/batch', methods=['POST', 'OPTIONS'])
+def handle_items_batch():
+    """Apply many item mutations in one transaction.
+
+    Request body: {"operations": [{"op": "star", "id": 1}, {"op": "set_clickbait", "youtube_id": "id", "is_clickbait": true}, ...]}
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    operations, error_response = validate_batch_request()
+    if error_response:
+        response, status_code = error_response
+        return response, status_code
+
+    try:
+        results = apply_batch_operations(operations)
+    except Exception as e:
+        print(f"Error in handle_items_batch: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+    updated = sum(1 for result in results if result['status'] == 'updated')
+    return jsonify({
+        'status': 'success',
+        'message': f'Applied {updated} of {len(results)} operations',
+        'data': {
+            'results': results
+        }
+    })
+
+def html_to_text(content):
+    """Strip tags and entities from item content, for the search index."""
+    if content is None:
+        return None
+    return html.unescape(re.sub(r'<[^>]+>', ' ', content))
 
 def determine_origin(url):
     if '/shorts/' in url: return "youtube shorts"
@@ -791,39 +2766,39 @@ def add_flag(flags_str, char):
 
 def remove_flag(flags_str, char):
     return (flags_str or '').replace(char, '')
-    
-# business logic
-def process_dearrow(items):
-    """Process items through business logic."""
-    # Get HTTP session once for all items
-    session = initialize_http_session()
-    
-    for item in items:
-        url = item['url']
-        print(url)
-        youtube_video_id = extract_youtube_video_id(url)
-        print(youtube_video_id)
-        if youtube_video_id is None: continue
-        
-        dearrow_info = http_get_dearrow_video_info(youtube_video_id, session)
-        if dearrow_info is None: continue
-        item['dearrow_info'] = dearrow_info
-        item['original_title'] = item['title']
 
-        try:
-            item['title'] = dearrow_info['titles'][0]['title']
-        except (KeyError, IndexError, TypeError):
-            continue
+def sql_add_flag(flags_str, char):
+    """SQL add_flag(): add a flag and keep the flags string normalized."""
+    return normalize_flags(add_flag(flags_str, char))
 
-        print(item)
-        
-    print('Finished processing items...')
-    return items
+def sql_remove_flag(flags_str, char):
+    """SQL remove_flag(): remove a flag and keep the flags string normalized."""
+    return normalize_flags(remove_flag(flags_str, char))
+
+def dearrow_branding_url(video_id):
+    return f'{args.dearrow_url.rstrip("/")}/api/branding?videoID={video_id}'
 
-def http_get_dearrow_video_info(video_id, session):
-    """Get the video info from Dearrow using the provided session."""
-    url = f'https://sponsor.ajay.app/api/branding?videoID={video_id}'
-    return http_fetch_json(session, url)
+def fetch_dearrow_branding(video_id, session):
+    """Fetch branding for one video from DeArrow. Returns (payload, cacheable).
+
+    A 404 is a cacheable miss (None, True); network errors and bad responses are (None, False).
+    """
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        response = session.get(dearrow_branding_url(video_id), headers={'Connection': 'keep-alive'}, timeout=5)
+        if response.status_code == 404:
+            outcome = 'not_found'
+            return None, True
+        response.raise_for_status()
+        payload = response.json()
+        outcome = 'ok'
+        return payload, True
+    except (requests.RequestException, ValueError):
+        return None, False
+    finally:
+        if args.metrics:
+            metrics.observe('nbserver_dearrow_upstream_duration_seconds', time.perf_counter() - started, {'outcome': outcome})
 
 def initialize_http_session():
     session = requests.Session()
@@ -832,17 +2807,380 @@ def initialize_http_session():
     session.mount('https://', adapter)
     return session
 
-def http_fetch_json(session, url, timeout=5):
+# Shared so upstream connections are kept alive between batches
+dearrow_session = initialize_http_session()
+
+def branding_has_titles(payload):
+    return bool(isinstance(payload, dict) and payload.get('titles'))
+
+def get_cached_branding(video_ids):
+    """Look up fresh cache entries. Returns (hits, misses).
+
+    hits maps video id -> payload (None for a cached 404); misses lists ids that are absent or stale.
+    Entries without titles expire after the negative TTL, the rest after the normal TTL.
+    Uses its own short-lived connection rather than get_db(), which would keep a pool slot
+    checked out through the upstream fetch that usually follows.
+    """
+    now = int(time.time())
+    hits = {}
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        for chunk in chunked(list(dict.fromkeys(video_ids))):
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f"""
+                SELECT youtube_id, payload
+                FROM dearrow_branding
+                WHERE youtube_id IN ({placeholders})
+                AND fetched_at > ? - CASE WHEN has_titles THEN ? ELSE ? END
+            """, [*chunk, now, args.dearrow_ttl, args.dearrow_negative_ttl])
+            for row in cursor:
+                hits[row['youtube_id']] = json.loads(row['payload']) if row['payload'] is not None else None
+
+    misses = [video_id for video_id in dict.fromkeys(video_ids) if video_id not in hits]
+    return hits, misses
+
+def store_branding(entries):
+    """Write (video_id, payload) pairs to the cache and take them off the prefetch queue; payload None records a miss.
+
+    Like get_cached_branding(), holds a pooled connection only for the write itself.
+    """
+    if not entries:
+        return
+    now = int(time.time())
+    with db_pool.connection() as conn, conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO dearrow_branding (youtube_id, payload, has_titles, fetched_at)
+            VALUES (?, ?, ?, ?)
+        """, [
+            (video_id, json.dumps(payload) if payload is not None else None, branding_has_titles(payload), now)
+            for video_id, payload in entries
+        ])
+        # Whatever was just fetched no longer needs prefetching
+        conn.executemany("DELETE FROM dearrow_queue WHERE youtube_id = ?", [(video_id,) for video_id, _ in entries])
+
+    titled = {video_id: payload for video_id, payload in entries if branding_has_titles(payload)}
+    if titled:
+        event_broadcaster.publish('dearrow', {'results': titled})
+
+def prune_dearrow_cache():
+    """Drop cache entries that are past both TTLs. Returns number of removed entries."""
+    conn = get_db()
+    with conn:
+        cursor = conn.execute("""
+            DELETE FROM dearrow_branding
+            WHERE fetched_at < CAST(strftime('%s', 'now') AS INTEGER) - ?
+        """, (max(args.dearrow_ttl, args.dearrow_negative_ttl),))
+    return cursor.rowcount
+
+# Counters behind /api/dearrow/status
+dearrow_stats = {
+    'cache_hits': 0,
+    'cache_misses': 0,
+    'prefetched': 0,
+    'prefetch_failures': 0,
+    'prefetch_dropped': 0,
+    'last_prefetch_at': None
+}
+dearrow_stats_lock = threading.Lock()
+
+def record_dearrow_lookups(hits, misses):
+    with dearrow_stats_lock:
+        dearrow_stats['cache_hits'] += hits
+        dearrow_stats['cache_misses'] += misses
+    if args.metrics:
+        metrics.inc('nbserver_dearrow_cache_lookups_total', {'result': 'hit'}, hits)
+        metrics.inc('nbserver_dearrow_cache_lookups_total', {'result': 'miss'}, misses)
+
+def enqueue_dearrow_prefetch():
+    """Queue youtube_ids of non-deleted items that have no fresh cache entry. Returns number newly queued."""
+    conn = get_db()
+    now = int(time.time())
+    with conn:
+        cursor = conn.execute("""
+            INSERT OR IGNORE INTO dearrow_queue (youtube_id, next_attempt_at)
+            SELECT DISTINCT rss_item.youtube_id, ?
+            FROM rss_item
+            LEFT JOIN dearrow_branding ON dearrow_branding.youtube_id = rss_item.youtube_id
+            WHERE rss_item.deleted = 0
+            AND rss_item.youtube_id IS NOT NULL
+            AND (
+                dearrow_branding.youtube_id IS NULL
+                OR dearrow_branding.fetched_at <= ? - CASE WHEN dearrow_branding.has_titles THEN ? ELSE ? END
+            )
+        """, (now, now, args.dearrow_ttl, args.dearrow_negative_ttl))
+    queued_count = cursor.rowcount
+    if queued_count:
+        prefetch_worker.wake()
+    return queued_count
+
+class DearrowPrefetchWorker:
+    """Background thread that drains dearrow_queue into the branding cache.
+
+    Failed fetches are retried with exponential backoff and dropped after MAX_ATTEMPTS.
+    The queue lives in the database, so pending work survives restarts.
+    """
+
+    BATCH_SIZE = 50
+    IDLE_INTERVAL = 60
+    BACKOFF_BASE = 30
+    BACKOFF_MAX = 60 * 60
+    MAX_ATTEMPTS = 6
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.concurrency <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='dearrow-prefetch', daemon=True)
+        self._thread.start()
+        # Registered after the pool's close, so it runs before the connections go away
+        atexit.register(self.stop)
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self):
+        self._wake.set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self._process_due_batch()
+            except Exception as e:
+                print(f"Error in DeArrow prefetch worker: {e}")
+                processed = 0
+            if not processed:
+                self._wake.wait(self.IDLE_INTERVAL)
+                self._wake.clear()
+
+    def _process_due_batch(self):
+        """Fetch up to BATCH_SIZE due queue entries. Returns number of entries processed.
+
+        A pooled connection is only held to read the queue and to record the results, not during the fetches.
+        """
+        with db_pool.connection() as conn:
+            cursor = conn.execute("""
+                SELECT youtube_id, attempts FROM dearrow_queue
+                WHERE next_attempt_at <= ?
+                ORDER BY next_attempt_at
+                LIMIT ?
+            """, (int(time.time()), self.BATCH_SIZE))
+            due = {row['youtube_id']: row['attempts'] for row in cursor}
+        if not due:
+            return 0
+
+        fetched, failed = [], []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            future_to_id = {
+                executor.submit(fetch_dearrow_branding_limited, vid, dearrow_session): vid
+                for vid in due
+            }
+            for future in concurrent.futures.as_completed(future_to_id):
+                video_id = future_to_id[future]
+                try:
+                    payload, cacheable = future.result()
+                except Exception as e:
+                    payload, cacheable = None, False
+                    print(f"Error prefetching video {video_id}: {e}")
+                if cacheable:
+                    fetched.append((video_id, payload))
+                else:
+                    failed.append(video_id)
+
+        self._record_results(fetched, failed, due)
+        return len(due)
+
+    def _record_results(self, fetched, failed, attempts):
+        now = int(time.time())
+        retries, dropped = [], []
+        for video_id in failed:
+            attempt = attempts[video_id] + 1
+            if attempt >= self.MAX_ATTEMPTS:
+                dropped.append((video_id,))
+            else:
+                delay = min(self.BACKOFF_BASE * 2 ** (attempt - 1), self.BACKOFF_MAX)
+                retries.append((attempt, now + delay, 'fetch failed', video_id))
+
+        store_branding(fetched)
+        with db_pool.connection() as conn, conn:
+            conn.executemany("DELETE FROM dearrow_queue WHERE youtube_id = ?", dropped)
+            conn.executemany("""
+                UPDATE dearrow_queue
+                SET attempts = ?, next_attempt_at = ?, last_error = ?
+                WHERE youtube_id = ?
+            """, retries)
+
+        with dearrow_stats_lock:
+            dearrow_stats['prefetched'] += len(fetched)
+            dearrow_stats['prefetch_failures'] += len(failed)
+            dearrow_stats['prefetch_dropped'] += len(dropped)
+            dearrow_stats['last_prefetch_at'] = now
+
+# Created by create_app() with the configured concurrency
+prefetch_worker = None
+
+@app.route('/api/dearrow/status', methods=['GET'])
+def get_dearrow_status():
+    """Report prefetch queue depth, cache size and the batch endpoint's cache hit rate."""
+    cursor = get_db().cursor()
+    cursor.execute("""
+        SELECT COUNT(*) AS depth, COALESCE(SUM(next_attempt_at <= ?), 0) AS due, COALESCE(SUM(attempts > 0), 0) AS retrying
+        FROM dearrow_queue
+    """, (int(time.time()),))
+    queue_row = cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) AS entries, COALESCE(SUM(has_titles), 0) AS with_titles FROM dearrow_branding")
+    cache_row = cursor.fetchone()
+
+    with dearrow_stats_lock:
+        stats = dict(dearrow_stats)
+    lookups = stats['cache_hits'] + stats['cache_misses']
+
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'queue': {
+                'depth': queue_row['depth'],
+                'due': queue_row['due'],
+                'retrying': queue_row['retrying']
+            },
+            'cache': {
+                'entries': cache_row['entries'],
+                'with_titles': cache_row['with_titles'],
+                'hits': stats['cache_hits'],
+                'misses': stats['cache_misses'],
+                'hit_rate': stats['cache_hits'] / lookups if lookups else None
+            },
+            'worker': {
+                'running': prefetch_worker.running,
+                'prefetched': stats['prefetched'],
+                'failures': stats['prefetch_failures'],
+                'dropped': stats['prefetch_dropped'],
+                'last_prefetch_at': stats['last_prefetch_at']
+            }
+        }
+    })
+
+class RateLimiter:
+    """Spaces calls to wait() at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next_slot = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+rate_limiters = {}
+rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(url):
+    """The shared rate limiter for url's host."""
+    host = urlparse(url).hostname
+    with rate_limiters_lock:
+        if host not in rate_limiters:
+            rate_limiters[host] = RateLimiter(args.dearrow_rate)
+        return rate_limiters[host]
+
+def fetch_dearrow_branding_limited(video_id, session):
+    get_rate_limiter(args.dearrow_url).wait()
+    return fetch_dearrow_branding(video_id, session)
+
+def iter_dearrow_branding(video_ids, deadline):
+    """Yield (video_id, payload, source) as each id resolves, cache hits first.
+
+    source is 'cache', 'upstream' or 'error'. Ids still pending at the deadline (a time.monotonic()
+    value) are not yielded at all. Upstream results are written to the cache when the generator finishes.
+    """
+    hits, misses = get_cached_branding(video_ids)
+    record_dearrow_lookups(len(hits), len(misses))
+    for video_id, payload in hits.items():
+        yield video_id, payload, 'cache'
+
+    if not misses:
+        return
+
+    fetched = []
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.dearrow_concurrency))
+    future_to_id = {
+        executor.submit(fetch_dearrow_branding_limited, vid, dearrow_session): vid
+        for vid in misses
+    }
     try:
-        response = session.get(url, headers={'Connection': 'keep-alive'}, timeout=timeout)
-        response.raise_for_status()
-        return response.json()
-    except (requests.RequestException, ValueError):
-        return None
+        for future in concurrent.futures.as_completed(future_to_id, timeout=max(0, deadline - time.monotonic())):
+            video_id = future_to_id[future]
+            try:
+                payload, cacheable = future.result()
+            except Exception as e:
+                print(f"Error processing video {video_id}: {e}")
+                yield video_id, None, 'error'
+                continue
+            if cacheable:
+                fetched.append((video_id, payload))
+            yield video_id, payload, 'upstream' if cacheable else 'error'
+    except concurrent.futures.TimeoutError:
+        pending = sum(1 for future in future_to_id if not future.done())
+        print(f"DeArrow batch deadline reached with {pending} videos unresolved")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        try:
+            store_branding(fetched)
+        except sqlite3.Error as e:
+            print(f"Error caching DeArrow branding: {e}")
+
+def stream_dearrow_ndjson(video_ids, deadline):
+    """Stream one line per resolved video with data, then a summary line listing unresolved ids."""
+    def generate():
+        resolved = set()
+        counts = {'cache': 0, 'upstream': 0, 'error': 0}
+        successful = 0
+        try:
+            for video_id, payload, source in iter_dearrow_branding(video_ids, deadline):
+                resolved.add(video_id)
+                counts[source] += 1
+                if payload:
+                    successful += 1
+                    yield json.dumps({'video_id': video_id, 'data': payload}) + '\n'
+        except Exception as e:
+            print(f"Error in batch processing: {e}")
+        unresolved = [video_id for video_id in dict.fromkeys(video_ids) if video_id not in resolved]
+        yield json.dumps({
+            'status': 'success',
+            'done': True,
+            'processed': len(video_ids),
+            'successful': successful,
+            'cached': counts['cache'],
+            'failed': counts['error'],
+            'unresolved': unresolved
+        }) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 @app.route('/api/dearrow/batch', methods=['POST', 'OPTIONS'])
 def get_dearrow_batch_info():
-    """Process multiple YouTube video IDs in batch."""
+    """Process multiple YouTube video IDs in batch, answering from the branding cache where possible.
+
+    Ids still unresolved at the deadline are reported in 'unresolved' alongside the partial results.
+    Send Accept: application/x-ndjson (or ?format=ndjson) to receive each result as it resolves.
+    """
     if request.method == 'OPTIONS':
         return '', 200
         
@@ -852,53 +3190,196 @@ def get_dearrow_batch_info():
         
         if not video_ids:
             return jsonify({'status': 'error', 'message': 'No video IDs provided'}), 400
-            
+
+        deadline = time.monotonic() + args.dearrow_deadline
+        if listing_format() == 'ndjson':
+            return stream_dearrow_ndjson(video_ids, deadline)
+
         results = {}
-        session = initialize_http_session()
-        
-        # Process in parallel with reasonable concurrency
-        # Each individual request has 5s timeout, but batch can take up to 1 minute total
-        #print(f"Starting batch processing of {len(video_ids)} video IDs...")
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_id = {
-                executor.submit(http_get_dearrow_video_info, vid, session): vid 
-                for vid in video_ids
-            }
-            
-            # Wait for all futures to complete with 60 second total timeout
-            completed = 0
-            for future in concurrent.futures.as_completed(future_to_id, timeout=60):
-                video_id = future_to_id[future]
-                completed += 1
-                
-                # Log progress every 50 items
-                if completed % 50 == 0:
-                    print(f"Processed {completed}/{len(video_ids)} videos...")
-                
-                try:
-                    result = future.result()
-                    if result:
-                        results[video_id] = result
-                    # If no result, just skip it (silent failure as requested)
-                except Exception as e:
-                    # Log error but continue processing other videos
-                    print(f"Error processing video {video_id}: {e}")
-                    continue
+        resolved = set()
+        counts = {'cache': 0, 'upstream': 0, 'error': 0}
+        for video_id, payload, source in iter_dearrow_branding(video_ids, deadline):
+            resolved.add(video_id)
+            counts[source] += 1
+            if payload:
+                results[video_id] = payload
         
-       #print(f"Batch processing complete. Successfully processed {len(results)}/{len(video_ids)} videos.")
+        unresolved = [video_id for video_id in dict.fromkeys(video_ids) if video_id not in resolved]
         return jsonify({
             'status': 'success',
             'data': results,
             'processed': len(video_ids),
-            'successful': len(results)
+            'successful': len(results),
+            'cached': counts['cache'],
+            'failed': counts['error'],
+            'unresolved': unresolved
         })
         
-    except concurrent.futures.TimeoutError:
-        print("Batch processing timed out after 60 seconds")
-        return jsonify({'status': 'error', 'message': 'Batch processing timed out'}), 408
     except Exception as e:
         print(f"Error in batch processing: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.before_request
+def start_request_timer():
+    if args.metrics:
+        g.request_started = time.perf_counter()
+
+def count_sent_bytes(body, sent):
+    try:
+        for chunk in body:
+            sent[0] += len(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+# Registered before compress_response so it runs after it and sees the compressed body
+@app.after_request
+def record_request_metrics(response):
+    """Record latency and body size once the response, streamed or buffered, has been sent."""
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+
+    labels = {
+        'method': request.method,
+        'route': request.url_rule.rule if request.url_rule else 'unmatched',
+        'status': str(response.status_code)
+    }
+    sent = [0]
+    if response.is_streamed:
+        response.response = count_sent_bytes(response.response, sent)
+
+    def record():
+        metrics.observe('nbserver_http_request_duration_seconds', time.perf_counter() - started, labels)
+        body_bytes = sent[0] if response.is_streamed else (response.content_length or 0)
+        metrics.inc('nbserver_http_response_bytes_total', {'route': labels['route']}, body_bytes)
+    response.call_on_close(record)
+    return response
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of the request, SQL and DeArrow metrics."""
+    if not args.metrics:
+        return jsonify({'status': 'error', 'message': 'Metrics are disabled, start the server with --metrics'}), 404
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# Response types worth compressing; streamed responses are left alone so lines arrive as they are produced
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'text/html', 'text/css', 'application/javascript',
+    *LISTING_FORMATS['columns'], *LISTING_FORMATS['msgpack']
+}
+
+@app.after_request
+def compress_response(response):
+    """gzip or brotli compress large buffered responses the client accepts compressed."""
+    if (args.compress_min_size <= 0
+            or response.direct_passthrough
+            or response.is_streamed
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    body = response.get_data()
+    if len(body) < args.compress_min_size:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        response.set_data(brotli.compress(body, quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
+
+    # Each encoding is a different representation, so it can't share the identity body's strong validator
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f"{etag}-{response.headers['Content-Encoding']}")
+    response.vary.add('Accept-Encoding')
+    return response
+
+def serve_production():
+    """Serve with waitress until SIGINT/SIGTERM, then let in-flight requests finish within --shutdown-timeout."""
+    import waitress
+    from waitress import wasyncore
+
+    server = waitress.create_server(
+        app,
+        host=args.host,
+        port=args.port,
+        threads=args.threads,
+        connection_limit=args.connection_limit,
+        channel_timeout=args.keep_alive
+    )
+
+    # waitress.run() handles signals by cancelling its threads on a fixed 5s timeout, so the loop
+    # runs on its own thread and the main thread stays free to wait for the signal and drive shutdown
+    stop_requested = threading.Event()
+
+    def request_shutdown(signum, frame):
+        stop_requested.set()
+    signal.signal(signal.SIGTERM, request_shutdown)
+    signal.signal(signal.SIGINT, request_shutdown)
+
+    print(f"Serving on http://{args.host}:{args.port} with {args.threads} threads")
+    loop_thread = threading.Thread(target=server.run, name='waitress-loop', daemon=True)
+    loop_thread.start()
+    # create_server() has already bound the socket, so clients can connect while this runs
+    start_background_tasks()
+    stop_requested.wait()
+
+    print("Shutting down...")
+    deadline = time.monotonic() + args.shutdown_timeout
+    # Stop accepting but keep the trigger and loop alive; thunks run on the loop thread between polls,
+    # so the listening socket is never closed under a select() that is watching it
+    server.trigger.pull_trigger(lambda: wasyncore.dispatcher.close(server))
+    event_broadcaster.close()
+    prefetch_worker.stop()
+    server.task_dispatcher.shutdown(cancel_pending=True, timeout=args.shutdown_timeout)
+    if server.task_dispatcher.threads:
+        # Closing now would pull the rug (and the trigger fd) out from under them; exiting ends them anyway
+        print(f"Shutdown timeout reached with {len(server.task_dispatcher.threads)} request(s) still running")
+    else:
+        # Finished tasks leave their response buffered on the channel; the loop writes it out
+        while time.monotonic() < deadline and any(
+            channel.total_outbufs_len for channel in list(server.active_channels.values())
+        ):
+            time.sleep(0.05)
+        server.close()
+    backfill_thread.join(max(0, deadline - time.monotonic()))
+
+def create_app(argv=None):
+    """Parse the command line, open the connection pool and apply pending schema migrations.
+
+    Only the cheap part of startup happens here; start_background_tasks() does the rest.
+    """
+    global args, db_pool, prefetch_worker, item_cache
+    started = time.monotonic()
+    args = parser.parse_args(argv)
+    db_pool = open_pool()
+    if args.item_cache_size > 0:
+        item_cache = ItemCache(args.db, args.item_cache_size)
+        atexit.register(item_cache.close)
+    prefetch_worker = DearrowPrefetchWorker(args.dearrow_prefetch_concurrency)
+    with app.app_context():
+        startup_state['migrated'] = initialize_schema()
+        startup_state['schema_version'] = get_schema_version()
+    print(f"Startup took {(time.monotonic() - started) * 1000:.0f} ms")
+    return app
+
+def main(argv=None):
+    create_app(argv)
+    if args.server == 'dev':
+        start_background_tasks()
+        # The reloader would run create_app() again in a second process
+        app.run(debug=True, use_reloader=False, host=args.host, port=args.port)
+    else:
+        serve_production()
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5001)  # Using port 5001 to avoid conflict with the original server 
+    # Port 5001 by default to avoid conflict with the original server
+    main()
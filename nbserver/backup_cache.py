@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""Incremental snapshots of the newsboat cache.
+
+Each snapshot is taken with SQLite's online backup API, so it is consistent even while
+newsboat or nbserver are writing. The copy is split into database pages; only pages not
+already in the store are compressed and appended to a pack file. A snapshot itself is just
+the list of its page hashes, so unchanged pages cost nothing and any snapshot can be restored
+on its own.
+
+Pages are compressed with zstd when the optional zstandard module is installed (pip install
+zstandard; requirements.txt leaves it out) and with zlib otherwise. Restoring zstd pages needs
+the module too.
+
+    python3 backup_cache.py --store ~/backups/newsboat snapshot --db newsboat_cache.db --include urls
+    python3 backup_cache.py --store ~/backups/newsboat list
+    python3 backup_cache.py --store ~/backups/newsboat restore 12 --output restored.db
+    python3 backup_cache.py --store ~/backups/newsboat prune --keep 30
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+HASH_SIZE = 16
+
+def chunk_hash(data):
+    return hashlib.blake2b(data, digest_size=HASH_SIZE).digest()
+
+def compress(data, codec):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+def decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("This snapshot contains zstd compressed pages; install zstandard to restore it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+class SnapshotStore:
+    """A directory holding pack files of compressed chunks and an index database of chunks and snapshots."""
+
+    def __init__(self, path):
+        self.path = path
+        self.packs_dir = os.path.join(path, 'packs')
+        os.makedirs(self.packs_dir, exist_ok=True)
+        self.index = sqlite3.connect(os.path.join(path, 'index.db'))
+        self.index.row_factory = sqlite3.Row
+        self.index.executescript("""
+            CREATE TABLE IF NOT EXISTS chunk (
+                hash BLOB PRIMARY KEY,
+                pack TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                codec TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_chunk_pack ON chunk(pack);
+
+            CREATE TABLE IF NOT EXISTS snapshot (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                page_size INTEGER NOT NULL,
+                page_count INTEGER NOT NULL,
+                pages BLOB NOT NULL,
+                files TEXT NOT NULL,
+                new_chunks INTEGER NOT NULL,
+                new_bytes INTEGER NOT NULL,
+                timings TEXT NOT NULL
+            );
+        """)
+
+    def close(self):
+        self.index.close()
+
+    def known_hashes(self):
+        return {row[0] for row in self.index.execute("SELECT hash FROM chunk")}
+
+    def iter_chunks(self, digests):
+        """Yield the data of each chunk in digests, in order, verifying it against its hash."""
+        self.index.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (seq INTEGER PRIMARY KEY, hash BLOB NOT NULL)")
+        self.index.execute("DELETE FROM temp.wanted")
+        self.index.executemany("INSERT INTO temp.wanted (hash) VALUES (?)", ((digest,) for digest in digests))
+        cursor = self.index.execute("""
+            SELECT wanted.hash, chunk.pack, chunk.offset, chunk.length, chunk.codec
+            FROM temp.wanted
+            LEFT JOIN chunk ON chunk.hash = wanted.hash
+            ORDER BY wanted.seq
+        """)
+        packs = {}
+        try:
+            for row in cursor:
+                yield self.read_chunk(row, packs)
+        finally:
+            for pack in packs.values():
+                pack.close()
+            self.index.rollback()
+
+    def read_chunk(self, row, packs):
+        digest = row['hash']
+        if row['pack'] is None:
+            raise RuntimeError(f"Chunk {digest.hex()} is missing from the store")
+        pack = packs.get(row['pack'])
+        if pack is None:
+            pack = packs[row['pack']] = open(os.path.join(self.packs_dir, row['pack']), 'rb')
+        pack.seek(row['offset'])
+        data = decompress(pack.read(row['length']), row['codec'])
+        if chunk_hash(data) != digest:
+            raise RuntimeError(f"Chunk {digest.hex()} in {row['pack']} is corrupt")
+        return data
+
+class PackWriter:
+    """Appends compressed chunks that the store does not have yet to a new pack file."""
+
+    def __init__(self, store, codec):
+        self.store = store
+        self.codec = codec
+        self.known = store.known_hashes()
+        self.name = f'{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}.pack'
+        self.file = open(os.path.join(store.packs_dir, self.name), 'wb')
+        self.entries = []
+        self.bytes_written = 0
+
+    def add(self, data):
+        """Store data unless an identical chunk exists. Returns its hash."""
+        digest = chunk_hash(data)
+        if digest not in self.known:
+            packed = compress(data, self.codec)
+            self.entries.append((digest, self.name, self.bytes_written, len(packed), self.codec))
+            self.file.write(packed)
+            self.bytes_written += len(packed)
+            self.known.add(digest)
+        return digest
+
+    def finish(self):
+        """Flush the pack to disk. Returns the chunk rows to record, after which the pack may be referenced."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        if not self.entries:
+            os.remove(self.file.name)
+        return self.entries
+
+def copy_database(db_path, copy_path):
+    """Consistent copy of a live database through the online backup API."""
+    if os.path.exists(copy_path):
+        os.remove(copy_path)
+    source = sqlite3.connect(db_path, timeout=30)
+    target = sqlite3.connect(copy_path)
+    try:
+        source.backup(target)
+        page_size = target.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+    return page_size
+
+def take_snapshot(store, db_path, include, codec):
+    """Snapshot db_path and the included files. Returns the new snapshot row id and a summary dict."""
+    timings = {}
+    started = time.monotonic()
+    copy_path = os.path.join(store.path, 'snapshot-copy.tmp')
+    page_size = copy_database(db_path, copy_path)
+    timings['copy'] = time.monotonic() - started
+
+    phase = time.monotonic()
+    writer = PackWriter(store, codec)
+    hashes = []
+    try:
+        with open(copy_path, 'rb') as copy:
+            while True:
+                page = copy.read(page_size)
+                if not page:
+                    break
+                hashes.append(writer.add(page))
+
+        files = []
+        for path in include:
+            with open(path, 'rb') as f:
+                data = f.read()
+            files.append({'path': os.path.abspath(path), 'name': os.path.basename(path), 'size': len(data), 'hash': writer.add(data).hex()})
+    finally:
+        entries = writer.finish()
+        os.remove(copy_path)
+    timings['pack'] = time.monotonic() - phase
+
+    phase = time.monotonic()
+    with store.index:
+        store.index.executemany("INSERT OR IGNORE INTO chunk (hash, pack, offset, length, codec) VALUES (?, ?, ?, ?, ?)", entries)
+        timings['index'] = time.monotonic() - phase
+        timings['total'] = time.monotonic() - started
+        cursor = store.index.execute("""
+            INSERT INTO snapshot (created_at, source, page_size, page_count, pages, files, new_chunks, new_bytes, timings)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            int(time.time()), os.path.abspath(db_path), page_size, len(hashes), zlib.compress(b''.join(hashes)),
+            json.dumps(files), len(entries), writer.bytes_written, json.dumps({k: round(v, 3) for k, v in timings.items()})
+        ))
+
+    return cursor.lastrowid, {
+        'pages': len(hashes),
+        'page_size': page_size,
+        'database_bytes': len(hashes) * page_size,
+        'new_chunks': len(entries),
+        'new_bytes': writer.bytes_written,
+        'timings': timings
+    }
+
+def restore_snapshot(store, snapshot_id, output, files_dir=None, verify=True):
+    """Write the snapshot's database to output and its included files to files_dir. Returns timings."""
+    row = store.index.execute("SELECT * FROM snapshot WHERE id = ?", (snapshot_id,)).fetchone()
+    if row is None:
+        raise RuntimeError(f"No snapshot {snapshot_id}")
+
+    timings = {}
+    started = time.monotonic()
+    pages = zlib.decompress(row['pages'])
+    temporary = output + '.restoring'
+    with open(temporary, 'wb') as out:
+        for page in store.iter_chunks(pages[offset:offset + HASH_SIZE] for offset in range(0, len(pages), HASH_SIZE)):
+            out.write(page)
+        out.flush()
+        os.fsync(out.fileno())
+
+    if files_dir:
+        os.makedirs(files_dir, exist_ok=True)
+        files = json.loads(row['files'])
+        for entry, data in zip(files, store.iter_chunks(bytes.fromhex(entry['hash']) for entry in files)):
+            with open(os.path.join(files_dir, entry['name']), 'wb') as out:
+                out.write(data)
+    timings['write'] = time.monotonic() - started
+
+    if verify:
+        phase = time.monotonic()
+        conn = sqlite3.connect(temporary)
+        try:
+            result = conn.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            conn.close()
+        if result != 'ok':
+            raise RuntimeError(f"Restored database failed quick_check: {result}")
+        timings['verify'] = time.monotonic() - phase
+
+    for suffix in ('-wal', '-shm'):
+        # A stale WAL next to the restored file would be replayed over it
+        if os.path.exists(output + suffix):
+            os.remove(output + suffix)
+    os.replace(temporary, output)
+    timings['total'] = time.monotonic() - started
+    return timings
+
+def prune_snapshots(store, keep):
+    """Delete all but the newest keep snapshots and the pack files no remaining snapshot uses.
+
+    Packs still holding any live chunk are kept whole. Returns (deleted snapshots, deleted packs, freed bytes).
+    """
+    with store.index:
+        deleted = store.index.execute("""
+            DELETE FROM snapshot WHERE id NOT IN (SELECT id FROM snapshot ORDER BY id DESC LIMIT ?)
+        """, (keep,)).rowcount
+
+    live = set()
+    for row in store.index.execute("SELECT pages, files FROM snapshot"):
+        pages = zlib.decompress(row['pages'])
+        live.update(pages[offset:offset + HASH_SIZE] for offset in range(0, len(pages), HASH_SIZE))
+        live.update(bytes.fromhex(entry['hash']) for entry in json.loads(row['files']))
+
+    live_packs = set()
+    dead = []
+    for row in store.index.execute("SELECT hash, pack FROM chunk"):
+        if row['hash'] in live:
+            live_packs.add(row['pack'])
+        else:
+            dead.append(row)
+
+    dead_packs = {row['pack'] for row in dead} - live_packs
+    freed = 0
+    with store.index:
+        for pack in dead_packs:
+            store.index.execute("DELETE FROM chunk WHERE pack = ?", (pack,))
+    for pack in dead_packs:
+        path = os.path.join(store.packs_dir, pack)
+        if os.path.exists(path):
+            freed += os.path.getsize(path)
+            os.remove(path)
+    return deleted, len(dead_packs), freed
+
+def format_bytes(count):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if count < 1024 or unit == 'GiB':
+            return f'{count:.1f} {unit}' if unit != 'B' else f'{count} B'
+        count /= 1024
+
+def format_timings(timings):
+    return ', '.join(f'{name} {seconds:.2f}s' for name, seconds in timings.items())
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental online snapshots of the newsboat cache')
+    parser.add_argument('--store', required=True, help='Snapshot store directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    snapshot_parser = commands.add_parser('snapshot', help='Take a snapshot of the cache')
+    snapshot_parser.add_argument('--db', required=True, help='Path to the newsboat cache database')
+    snapshot_parser.add_argument('--include', action='append', default=[], help='Extra file to store with the snapshot, repeatable')
+    snapshot_parser.add_argument('--codec', choices=['zstd', 'zlib'], default='zstd' if zstandard else 'zlib',
+                                 help='Compression for new pages (default: zstd if the optional zstandard module is installed, '
+                                      'which requirements.txt does not include; zlib otherwise)')
+
+    commands.add_parser('list', help='List snapshots')
+
+    restore_parser = commands.add_parser('restore', help='Restore a snapshot')
+    restore_parser.add_argument('snapshot_id', type=int, help='Snapshot to restore (see list)')
+    restore_parser.add_argument('--output', required=True, help='Where to write the restored database')
+    restore_parser.add_argument('--files-dir', help='Directory to restore the included files to')
+    restore_parser.add_argument('--force', action='store_true', help='Overwrite an existing output file')
+    restore_parser.add_argument('--no-verify', action='store_true', help='Skip PRAGMA quick_check on the restored database')
+
+    prune_parser = commands.add_parser('prune', help='Delete old snapshots and the data only they used')
+    prune_parser.add_argument('--keep', type=int, required=True, help='Number of newest snapshots to keep')
+
+    options = parser.parse_args()
+
+    if options.command == 'snapshot' and options.codec == 'zstd' and zstandard is None:
+        parser.error("zstd needs the zstandard module (pip install zstandard)")
+    if options.command == 'snapshot' and not os.path.exists(options.db):
+        parser.error(f"Database file not found at {options.db}")
+
+    store = SnapshotStore(options.store)
+    try:
+        if options.command == 'snapshot':
+            snapshot_id, summary = take_snapshot(store, options.db, options.include, options.codec)
+            print(f"Snapshot {snapshot_id}: {summary['pages']} pages ({format_bytes(summary['database_bytes'])}), "
+                  f"{summary['new_chunks']} new chunks stored in {format_bytes(summary['new_bytes'])}")
+            print(f"Timings: {format_timings(summary['timings'])}")
+
+        elif options.command == 'list':
+            for row in store.index.execute("SELECT * FROM snapshot ORDER BY id"):
+                timings = json.loads(row['timings'])
+                files = ', '.join(entry['name'] for entry in json.loads(row['files']))
+                print(f"{row['id']:>5}  {datetime.fromtimestamp(row['created_at']):%Y-%m-%d %H:%M:%S}  "
+                      f"{format_bytes(row['page_count'] * row['page_size']):>10}  +{format_bytes(row['new_bytes']):>10}  "
+                      f"{timings.get('total', 0):6.2f}s  {files}")
+            packs_size = sum(entry.stat().st_size for entry in os.scandir(store.packs_dir))
+            print(f"Store size: {format_bytes(packs_size)}")
+
+        elif options.command == 'restore':
+            if os.path.exists(options.output) and not options.force:
+                parser.error(f"{options.output} exists; pass --force to overwrite it")
+            timings = restore_snapshot(store, options.snapshot_id, options.output, options.files_dir, not options.no_verify)
+            print(f"Restored snapshot {options.snapshot_id} to {options.output}")
+            print(f"Timings: {format_timings(timings)}")
+
+        elif options.command == 'prune':
+            deleted, packs, freed = prune_snapshots(store, options.keep)
+            print(f"Deleted {deleted} snapshots and {packs} pack files, freed {format_bytes(freed)}")
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
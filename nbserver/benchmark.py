@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""Load test nbserver against synthetic newsboat caches.
+
+Generates newsboat-shaped databases of the requested sizes, starts api_server.py on a
+copy of each with a local stub standing in for DeArrow, drives the main endpoints with
+concurrent clients and reports latency percentiles, throughput, response bytes and the
+server's peak RSS. Results are written as JSON so runs from different commits can be
+compared with --compare.
+
+    python3 benchmark.py --items 1000,50000 --clients 4 --duration 10
+    python3 benchmark.py --items 50000 --compare bench-1a2b3c4.json
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_server.py')
+
+# Tables and indexes as newsboat creates them
+NEWSBOAT_SCHEMA = """
+    CREATE TABLE rss_feed (
+        rssurl VARCHAR(1024) PRIMARY KEY NOT NULL,
+        url VARCHAR(1024) NOT NULL,
+        title VARCHAR(1024) NOT NULL,
+        lastmodified INTEGER(11) NOT NULL DEFAULT 0,
+        is_rtl INTEGER(1) NOT NULL DEFAULT 0,
+        etag VARCHAR(128) NOT NULL DEFAULT ""
+    );
+    CREATE TABLE rss_item (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guid VARCHAR(64) NOT NULL,
+        title VARCHAR(1024) NOT NULL,
+        author VARCHAR(1024) NOT NULL,
+        url VARCHAR(1024) NOT NULL,
+        feedurl VARCHAR(1024) NOT NULL,
+        pubDate INTEGER NOT NULL,
+        content VARCHAR(65535) NOT NULL,
+        unread INTEGER(1) NOT NULL,
+        enclosure_url VARCHAR(1024),
+        enclosure_type VARCHAR(1024),
+        enqueued INTEGER(1) NOT NULL DEFAULT 0,
+        flags VARCHAR(52),
+        deleted INTEGER(1) NOT NULL DEFAULT 0,
+        base VARCHAR(128) NOT NULL DEFAULT "",
+        content_mime_type VARCHAR(255) NOT NULL DEFAULT ""
+    );
+    CREATE INDEX idx_rssurl ON rss_feed(rssurl);
+    CREATE INDEX idx_guid ON rss_item(guid);
+    CREATE INDEX idx_feedurl ON rss_item(feedurl);
+    CREATE INDEX idx_lastmodified ON rss_feed(lastmodified);
+    CREATE INDEX idx_deleted ON rss_item(deleted);
+"""
+
+WORDS = (
+    'video new update review first look how why best worst build guide live stream full episode '
+    'part series news today week tutorial explained reaction official trailer behind scenes channel '
+    'music game tech science history travel cooking workshop interview podcast highlights final'
+).split()
+
+def random_text(rng, length):
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length]
+
+def random_content(rng):
+    """HTML roughly the size of real feed entries: mostly a few KB, occasionally tens of KB."""
+    length = int(min(max(rng.lognormvariate(7.3, 0.9), 100), 60000))
+    paragraphs = []
+    while length > 0:
+        chunk = min(length, rng.randint(200, 800))
+        paragraphs.append(f'<p>{random_text(rng, chunk)}</p>')
+        length -= chunk
+    return ''.join(paragraphs)
+
+def generate_database(path, item_count, seed=1, youtube_share=0.8, deleted_share=0.3):
+    """Write a newsboat cache with item_count items spread over feeds sized like a real subscription list."""
+    rng = random.Random(seed)
+    feed_count = max(5, min(item_count // 40, 400))
+    feeds = []
+    for i in range(feed_count):
+        if rng.random() < youtube_share:
+            channel_id = f'UC{i:022d}'
+            feeds.append((f'https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}',
+                          f'https://www.youtube.com/channel/{channel_id}', f'{random_text(rng, 18).title()} {i}', True))
+        else:
+            feeds.append((f'https://blog{i}.example.com/feed.xml', f'https://blog{i}.example.com',
+                          f'{random_text(rng, 14).title()} Blog {i}', False))
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript(NEWSBOAT_SCHEMA)
+    conn.executemany("INSERT INTO rss_feed (rssurl, url, title) VALUES (?, ?, ?)", [feed[:3] for feed in feeds])
+
+    now = int(time.time())
+    rows = []
+    for i in range(item_count):
+        rssurl, feed_url, feed_title, is_youtube = rng.choice(feeds)
+        if is_youtube:
+            video_id = f'{i:011d}'[-11:]
+            url = f'https://www.youtube.com/shorts/{video_id}' if rng.random() < 0.1 else f'https://www.youtube.com/watch?v={video_id}'
+        else:
+            url = f'{feed_url}/posts/{i}'
+        flags = 'S' if rng.random() < 0.05 else None
+        # Older items are more likely to have been deleted already, like a long-lived cache
+        age = rng.randint(0, 365 * 24 * 60 * 60)
+        deleted = 1 if rng.random() < deleted_share * age / (365 * 24 * 60 * 60) * 2 else 0
+        rows.append((
+            f'{url}#{i}', random_text(rng, rng.randint(30, 90)).capitalize(), feed_title, url, rssurl,
+            now - age, random_content(rng), rng.random() < 0.7, flags, deleted
+        ))
+        if len(rows) >= 5000:
+            insert_items(conn, rows)
+            rows = []
+    insert_items(conn, rows)
+    conn.commit()
+    conn.close()
+
+def insert_items(conn, rows):
+    conn.executemany("""
+        INSERT INTO rss_item (guid, title, author, url, feedurl, pubDate, content, unread, flags, deleted)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+
+def prepare_database(cache_dir, work_dir, item_count, seed):
+    """Copy a generated cache of item_count items to a scratch file, generating it first if needed."""
+    os.makedirs(cache_dir, exist_ok=True)
+    cached = os.path.join(cache_dir, f'newsboat_{item_count}_{seed}.db')
+    if not os.path.exists(cached):
+        print(f"Generating {item_count} items into {cached}...")
+        started = time.monotonic()
+        generate_database(cached + '.tmp', item_count, seed)
+        os.replace(cached + '.tmp', cached)
+        print(f"Generated in {time.monotonic() - started:.1f}s")
+
+    work = os.path.join(work_dir, f'bench_{item_count}.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(work + suffix):
+            os.remove(work + suffix)
+    shutil.copyfile(cached, work)
+    return work
+
+class StubDearrowHandler(BaseHTTPRequestHandler):
+    """Answers /api/branding like DeArrow: titles for most videos, none or 404 for the rest."""
+
+    protocol_version = 'HTTP/1.1'
+    delay = 0.05
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        video_id = parse_qs(urlparse(self.path).query).get('videoID', [''])[0]
+        time.sleep(self.delay)
+        bucket = sum(map(ord, video_id)) % 10
+        if bucket == 0:
+            self.send_response(404)
+            body = b'Not Found'
+        else:
+            titles = [] if bucket == 1 else [{'title': f'Better title for {video_id}', 'original': False, 'votes': 3}]
+            body = json.dumps({'titles': titles, 'thumbnails': [], 'randomTime': 0.5}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_stub_dearrow(delay):
+    handler = type('Handler', (StubDearrowHandler,), {'delay': delay})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class ServerProcess:
+    """api_server.py running in its own process, so its memory is measured on its own."""
+
+    def __init__(self, db_path, dearrow_url, server_args, log_path):
+        self.port = free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        command = [
+            sys.executable, SERVER_SCRIPT, '--db', db_path, '--host', '127.0.0.1', '--port', str(self.port),
+            '--dearrow-url', dearrow_url, '--dearrow-prefetch-concurrency', '0', *server_args
+        ]
+        self.log = open(log_path, 'ab')
+        self.started = time.monotonic()
+        self.process = subprocess.Popen(command, stdout=self.log, stderr=subprocess.STDOUT)
+        self.listening_after = None
+        self.ready_after = None
+
+    def wait_ready(self, timeout=600):
+        """Wait for /api/health to report the startup backfill as done. Returns seconds taken."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self.process.returncode}, see {self.log.name}")
+            try:
+                response = requests.get(f'{self.base_url}/api/health', timeout=2)
+                if self.listening_after is None:
+                    self.listening_after = time.monotonic() - self.started
+                if response.status_code == 200:
+                    self.ready_after = time.monotonic() - self.started
+                    return self.ready_after
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.05)
+        raise RuntimeError(f"Server not ready after {timeout}s")
+
+    def peak_rss_kb(self):
+        try:
+            with open(f'/proc/{self.process.pid}/status') as status:
+                for line in status:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return None
+
+    def stop(self):
+        peak = self.peak_rss_kb()
+        self.process.terminate()
+        try:
+            self.process.wait(30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.log.close()
+        if peak is None:
+            # No /proc; ru_maxrss covers every child so far, in KiB on Linux and bytes on macOS
+            peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            if sys.platform == 'darwin':
+                peak //= 1024
+        return peak
+
+class Workload:
+    """Shared state the scenario functions draw ids from."""
+
+    def __init__(self, db_path, rng):
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT id, youtube_id FROM rss_item WHERE deleted = 0").fetchall()
+        conn.close()
+        self.rng = rng
+        self.item_ids = [row[0] for row in rows]
+        self.youtube_ids = [row[1] for row in rows if row[1]]
+        self.deletable = list(self.item_ids)
+        rng.shuffle(self.deletable)
+        self.lock = threading.Lock()
+
+    def sample_item_id(self):
+        with self.lock:
+            return self.rng.choice(self.item_ids)
+
+    def sample_youtube_ids(self, count):
+        with self.lock:
+            return self.rng.sample(self.youtube_ids, min(count, len(self.youtube_ids)))
+
+    def take_deletable(self, count):
+        with self.lock:
+            taken, self.deletable = self.deletable[:count], self.deletable[count:]
+            return taken
+
+def scenario_items(session, base_url, workload, state):
+    return session.get(f'{base_url}/api/items')
+
+def scenario_items_ndjson(session, base_url, workload, state):
+    return session.get(f'{base_url}/api/items', headers={'Accept': 'application/x-ndjson'})
+
+def scenario_items_columns(session, base_url, workload, state):
+    return session.get(f'{base_url}/api/items', params={'format': 'columns'})
+
+def scenario_items_paged(session, base_url, workload, state):
+    """Walk the listing 100 items at a time, starting over at the end."""
+    params = {'limit': 100}
+    if state.get('after'):
+        params['after'] = state['after']
+    response = session.get(f'{base_url}/api/items', params=params)
+    if response.ok:
+        state['after'] = response.json().get('next_after')
+    return response
+
+def scenario_channels(session, base_url, workload, state):
+    return session.get(f'{base_url}/api/channels')
+
+def scenario_unqualified(session, base_url, workload, state):
+    return session.get(f'{base_url}/api/items/unqualified', params={'limit': 100})
+
+def scenario_toggle_unread(session, base_url, workload, state):
+    return session.post(f'{base_url}/api/items/{workload.sample_item_id()}')
+
+def scenario_star(session, base_url, workload, state):
+    item_id = workload.sample_item_id()
+    if workload.rng.random() < 0.5:
+        return session.post(f'{base_url}/api/items/{item_id}/starred')
+    return session.delete(f'{base_url}/api/items/{item_id}/starred')
+
+def scenario_set_clickbait(session, base_url, workload, state):
+    return session.post(f'{base_url}/api/items/set-is-clickbait', json={
+        'youtube_ids': workload.sample_youtube_ids(state['batch_size']),
+        'is_clickbait': workload.rng.random() < 0.5
+    })
+
+def scenario_dearrow(session, base_url, workload, state):
+    return session.post(f'{base_url}/api/dearrow/batch', json={'video_ids': workload.sample_youtube_ids(state['batch_size'])})
+
+def scenario_batch_delete(session, base_url, workload, state):
+    item_ids = workload.take_deletable(state['batch_size'])
+    if not item_ids:
+        return None
+    return session.post(f'{base_url}/api/items/batch-delete', json={'item_ids': item_ids})
+
+# Run in this order; batch_delete shrinks the listing, so it goes last
+SCENARIOS = {
+    'items': scenario_items,
+    'items_ndjson': scenario_items_ndjson,
+    'items_columns': scenario_items_columns,
+    'items_paged': scenario_items_paged,
+    'channels': scenario_channels,
+    'unqualified': scenario_unqualified,
+    'toggle_unread': scenario_toggle_unread,
+    'star': scenario_star,
+    'set_clickbait': scenario_set_clickbait,
+    'dearrow': scenario_dearrow,
+    'batch_delete': scenario_batch_delete
+}
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def response_bytes(response):
+    """Body bytes on the wire: Content-Length when sent, otherwise the decoded body size."""
+    length = response.headers.get('Content-Length')
+    return int(length) if length is not None else len(response.content)
+
+def run_scenario(name, base_url, workload, clients, duration, batch_size, requests_per_client=None):
+    """Run one scenario with `clients` threads for `duration` seconds, or until each made requests_per_client requests."""
+    scenario = SCENARIOS[name]
+    latencies, errors, sent_bytes = [], [0], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        session = requests.Session()
+        state = {'batch_size': batch_size}
+        made = 0
+        while time.monotonic() < deadline and (requests_per_client is None or made < requests_per_client):
+            made += 1
+            started = time.perf_counter()
+            try:
+                response = scenario(session, base_url, workload, state)
+                if response is None:
+                    break
+                body_bytes = response_bytes(response)
+                failed = response.status_code >= 400
+            except requests.RequestException:
+                body_bytes, failed = 0, True
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                sent_bytes[0] += body_bytes
+                errors[0] += failed
+        session.close()
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    count = len(latencies)
+    to_ms = lambda seconds: None if seconds is None else round(seconds * 1000, 2)
+    return {
+        'requests': count,
+        'errors': errors[0],
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(count / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'p50': to_ms(percentile(latencies, 0.50)),
+            'p95': to_ms(percentile(latencies, 0.95)),
+            'p99': to_ms(percentile(latencies, 0.99)),
+            'max': to_ms(latencies[-1] if latencies else None),
+            'mean': to_ms(sum(latencies) / count if count else None)
+        },
+        'response_bytes': sent_bytes[0],
+        'bytes_per_request': sent_bytes[0] // count if count else 0
+    }
+
+def git_revision():
+    repo = os.path.dirname(SERVER_SCRIPT)
+    try:
+        revision = subprocess.check_output(['git', '-C', repo, 'rev-parse', '--short', 'HEAD'], text=True).strip()
+        dirty = bool(subprocess.check_output(['git', '-C', repo, 'status', '--porcelain', '--', '.'], text=True).strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return revision, dirty
+
+def benchmark_size(item_count, options, stub_url):
+    db_path = prepare_database(options.cache_dir, options.work_dir, item_count, options.seed)
+    log_path = os.path.join(options.work_dir, 'bench_server.log')
+    server = ServerProcess(db_path, stub_url, options.server_arg, log_path)
+    try:
+        ready_after = server.wait_ready()
+        workload = Workload(db_path, random.Random(options.seed))
+        print(f"\n{item_count} items ({len(workload.item_ids)} live): listening after {server.listening_after:.2f}s, ready after {ready_after:.2f}s")
+        scenarios = {}
+        for name in options.scenarios:
+            # One untimed request per client so connection setup and cold caches don't count
+            run_scenario(name, server.base_url, workload, options.clients, options.duration, options.batch_size, requests_per_client=1)
+            result = run_scenario(name, server.base_url, workload, options.clients, options.duration, options.batch_size)
+            scenarios[name] = result
+            print_result(name, result)
+    finally:
+        peak_rss_kb = server.stop()
+    print(f"Peak server RSS: {peak_rss_kb / 1024:.1f} MiB" if peak_rss_kb else "Peak server RSS: unknown")
+    return {
+        'items': item_count,
+        'live_items': len(workload.item_ids),
+        'database_bytes': os.path.getsize(db_path),
+        'listening_seconds': round(server.listening_after, 3),
+        'ready_seconds': round(ready_after, 3),
+        'peak_rss_kb': peak_rss_kb,
+        'scenarios': scenarios
+    }
+
+def print_result(name, result, previous=None):
+    latency = result['latency_ms']
+    line = (f"  {name:<14} {result['requests']:>7} req {result['throughput_rps'] or 0:>9.1f} req/s"
+            f"  p50 {latency['p50'] or 0:>8.1f} ms  p95 {latency['p95'] or 0:>8.1f} ms  p99 {latency['p99'] or 0:>8.1f} ms"
+            f"  {result['bytes_per_request']:>9} B/req  {result['errors']} errors")
+    if previous:
+        line += f"  (p95 {change(latency['p95'], previous['latency_ms']['p95'])}, req/s {change(result['throughput_rps'], previous['throughput_rps'])})"
+    print(line)
+
+def change(current, previous):
+    if not current or not previous:
+        return 'n/a'
+    return f'{(current - previous) / previous * 100:+.0f}%'
+
+def print_comparison(results, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    previous_runs = {run['items']: run for run in previous['runs']}
+    print(f"\nCompared with {previous_path} ({previous.get('git_revision')}):")
+    for run in results['runs']:
+        earlier = previous_runs.get(run['items'])
+        if earlier is None:
+            print(f"  {run['items']} items: not in previous results")
+            continue
+        print(f"  {run['items']} items: ready {change(run['ready_seconds'], earlier['ready_seconds'])}, "
+              f"peak RSS {change(run['peak_rss_kb'], earlier['peak_rss_kb'])}")
+        for name, result in run['scenarios'].items():
+            print_result(name, result, earlier['scenarios'].get(name))
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test nbserver against synthetic newsboat caches')
+    parser.add_argument('--items', default='1000,10000', help='Comma separated cache sizes to test, e.g. 1000,100000,500000')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f'Comma separated scenarios to run (default: all of {", ".join(SCENARIOS)})')
+    parser.add_argument('--clients', type=int, default=4, help='Concurrent client threads per scenario')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds each scenario runs')
+    parser.add_argument('--batch-size', type=int, default=50, help='Ids per batch-delete, set-is-clickbait and DeArrow request')
+    parser.add_argument('--dearrow-delay', type=float, default=0.05, help='Seconds the stub DeArrow server takes per branding request')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the synthetic data and request mix')
+    parser.add_argument('--cache-dir', default=os.path.join('/tmp', 'nbserver-benchmark'), help='Where generated databases are kept between runs')
+    parser.add_argument('--work-dir', default=None, help='Where the scratch database copy and server log go (default: --cache-dir)')
+    parser.add_argument('--server-arg', action='append', default=[], help='Extra api_server.py argument, repeatable (e.g. --server-arg=--threads=16)')
+    parser.add_argument('--output', help='Results file (default: bench-<revision>-<timestamp>.json)')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    options = parser.parse_args()
+
+    options.scenarios = [name.strip() for name in options.scenarios.split(',') if name.strip()]
+    unknown = [name for name in options.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+    options.work_dir = options.work_dir or options.cache_dir
+    os.makedirs(options.work_dir, exist_ok=True)
+
+    revision, dirty = git_revision()
+    stub = start_stub_dearrow(options.dearrow_delay)
+    stub_url = f'http://127.0.0.1:{stub.server_address[1]}'
+
+    results = {
+        'git_revision': revision,
+        'git_dirty': dirty,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'sqlite': sqlite3.sqlite_version,
+        'options': {
+            'clients': options.clients,
+            'duration': options.duration,
+            'batch_size': options.batch_size,
+            'dearrow_delay': options.dearrow_delay,
+            'seed': options.seed,
+            'server_args': options.server_arg
+        },
+        'runs': []
+    }
+    try:
+        for item_count in (int(size) for size in options.items.split(',')):
+            results['runs'].append(benchmark_size(item_count, options, stub_url))
+    finally:
+        stub.shutdown()
+
+    output = options.output or f"bench-{revision or 'unknown'}{'-dirty' if dirty else ''}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if options.compare:
+        print_comparison(results, options.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import api_server
+
+# The parts of newsboat's cache schema nbserver reads
+NEWSBOAT_SCHEMA = """
+    CREATE TABLE rss_feed (
+        rssurl VARCHAR(1024) PRIMARY KEY NOT NULL, url VARCHAR(1024) NOT NULL, title VARCHAR(1024) NOT NULL,
+        lastmodified INTEGER(11) NOT NULL DEFAULT 0, is_rtl INTEGER(1) NOT NULL DEFAULT 0, etag VARCHAR(128) NOT NULL DEFAULT ""
+    );
+    CREATE TABLE rss_item (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, guid VARCHAR(64) NOT NULL, title VARCHAR(1024) NOT NULL,
+        author VARCHAR(1024) NOT NULL, url VARCHAR(1024) NOT NULL, feedurl VARCHAR(1024) NOT NULL,
+        pubDate INTEGER NOT NULL, content VARCHAR(65535) NOT NULL, unread INTEGER(1) NOT NULL,
+        enclosure_url VARCHAR(1024), enclosure_type VARCHAR(1024), enqueued INTEGER(1) NOT NULL DEFAULT 0,
+        flags VARCHAR(52), deleted INTEGER(1) NOT NULL DEFAULT 0, base VARCHAR(128) NOT NULL DEFAULT "",
+        content_mime_type VARCHAR(255) NOT NULL DEFAULT ""
+    );
+    CREATE INDEX idx_feedurl ON rss_item(feedurl);
+    CREATE INDEX idx_deleted ON rss_item(deleted);
+"""
+
+FEED_URL = 'https://www.youtube.com/feeds/videos.xml?channel_id=C1'
+
+
+class ChangeLogPruningTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'cache.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(NEWSBOAT_SCHEMA)
+        conn.execute("INSERT INTO rss_feed (rssurl, url, title) VALUES (?, 'https://www.youtube.com/channel/C1', 'Channel')", (FEED_URL,))
+        conn.commit()
+        conn.close()
+
+        self.app = api_server.create_app(['--db', self.db_path, '--item-cache-size', '0'])
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        api_server.db_pool.close()
+        self.tmp.cleanup()
+
+    def newsboat_write(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute(sql, params)
+        conn.close()
+
+    def add_item(self, n):
+        self.newsboat_write("""
+            INSERT INTO rss_item (guid, title, author, url, feedurl, pubDate, content, unread)
+            VALUES (?, ?, 'author', ?, ?, ?, '', 1)
+        """, (f'guid{n}', f'Title {n}', f'https://www.youtube.com/watch?v=vid{n:08d}', FEED_URL, 1700000000 + n))
+
+    def changes_since(self, since):
+        response = self.client.get(f'/api/items/changes?since={since}')
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()['data']
+
+    def prune_everything(self):
+        self.newsboat_write("UPDATE nbserver_item_change SET changed_at = 0")
+        with self.app.app_context():
+            api_server.prune_change_log()
+
+    def test_token_survives_pruning_the_whole_log(self):
+        for n in range(3):
+            self.add_item(n)
+        old_token = self.changes_since(0)['token']
+        self.add_item(3)
+        token = self.changes_since(old_token)['token']
+        self.assertGreater(token, old_token)
+
+        self.prune_everything()
+
+        delta = self.changes_since(old_token)
+        self.assertTrue(delta['reset'])
+        self.assertEqual(delta['token'], token)
+
+        delta = self.changes_since(token)
+        self.assertFalse(delta['reset'])
+        self.assertEqual(delta['token'], token)
+
+    def test_changes_after_pruning_continue_from_the_old_token(self):
+        self.add_item(0)
+        token = self.changes_since(0)['token']
+        self.prune_everything()
+
+        self.add_item(1)
+        delta = self.changes_since(token)
+        self.assertFalse(delta['reset'])
+        self.assertGreater(delta['token'], token)
+        self.assertEqual(len(delta['inserted']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()